@@ -102,6 +102,10 @@ def defPaths(customSavePath):
 
     # Caching modifiers, disable all gamedata caching, its unneeded.
     eos.config.gamedataCache = False
+    # Gamedata is never modified by pyfa itself, let threads read it concurrently
+    eos.config.gamedataReadOnly = True
+    # Saveddata commits shouldn't make GUI wait for disk
+    eos.config.saveddataWal = True
     # saveddata db location modifier, shouldn't ever need to touch this
     eos.config.saveddata_connectionstring = "sqlite:///" + saveDB + "?check_same_thread=False"
     eos.config.gamedata_connectionstring = "sqlite:///" + gameDB + "?check_same_thread=False"
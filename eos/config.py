@@ -4,6 +4,16 @@ from os.path import realpath, join, dirname, abspath
 debug = False
 gamedataCache = True
 saveddataCache = True
+# Share pool of read-only connections to file-based gamedata database between
+# threads. Leave disabled for tools which write gamedata (e.g. jsonToSql)
+gamedataReadOnly = False
+# Amount of pooled gamedata connections kept open, more are opened on demand
+gamedataPoolSize = 5
+# Size of memory-mapped part of gamedata database file per connection, in bytes
+gamedataMmapSize = 256 * 1024 * 1024
+# Keep saveddata database file in write-ahead log mode with normal synchronization:
+# commits don't wait for disk sync and database stays consistent after crashes
+saveddataWal = False
 gamedata_version = ""
 gamedata_connectionstring = 'sqlite:///' + unicode(realpath(join(dirname(abspath(__file__)), "..", "eve.db")),
                                                    sys.getfilesystemencoding())
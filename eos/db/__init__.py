@@ -19,8 +19,10 @@
 
 import threading
 
-from sqlalchemy import MetaData, create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import MetaData, create_engine, event
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 import migration
 from eos import config
@@ -33,15 +35,63 @@ class ReadOnlyException(Exception):
     pass
 
 
+def isFileDatabase(connectionstring):
+    url = make_url(connectionstring)
+    return url.drivername.startswith("sqlite") and url.database not in (None, "", ":memory:")
+
+
+def createReadOnlyEngine(connectionstring):
+    """
+    Create engine with pool of read-only connections to sqlite database file,
+    connections are handed out to whichever thread needs them
+    """
+    engine = create_engine(connectionstring, echo=config.debug, poolclass=QueuePool,
+                           pool_size=config.gamedataPoolSize, max_overflow=-1,
+                           connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def setPragmas(dbapi_connection, connection_record):
+        # Python 2 sqlite3 module can't open URI filenames, thus immutable flag
+        # is not available; query_only and mmap_size give us read-only
+        # connections reading straight from the page cache of the OS
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only = ON")
+        if config.gamedataMmapSize:
+            cursor.execute("PRAGMA mmap_size = {0}".format(int(config.gamedataMmapSize)))
+        cursor.close()
+
+    return engine
+
+
+def enableWal(engine):
+    """
+    Put sqlite database in write-ahead log mode. With normal synchronization
+    only checkpoints wait for data to reach the disk, commits do not, and
+    a crash can lose just the last commits but never corrupt the database
+    """
+    @event.listens_for(engine, "connect")
+    def setPragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
+
+    return engine
+
+
 gamedata_connectionstring = config.gamedata_connectionstring
 if callable(gamedata_connectionstring):
     gamedata_engine = create_engine("sqlite://", creator=gamedata_connectionstring, echo=config.debug)
+elif config.gamedataReadOnly and isFileDatabase(gamedata_connectionstring):
+    gamedata_engine = createReadOnlyEngine(gamedata_connectionstring)
 else:
     gamedata_engine = create_engine(gamedata_connectionstring, echo=config.debug)
 
 gamedata_meta = MetaData()
 gamedata_meta.bind = gamedata_engine
-gamedata_session = sessionmaker(bind=gamedata_engine, autoflush=False, expire_on_commit=False)()
+# Every thread gets its own session. Worker threads should hand IDs over to
+# the GUI thread rather than objects, which lazy load through their session
+gamedata_session = scoped_session(sessionmaker(bind=gamedata_engine, autoflush=False, expire_on_commit=False))
 
 # This should be moved elsewhere, maybe as an actual query. Current, without try-except, it breaks when making a new
 # game db because we haven't reached gamedata_meta.create_all()
@@ -60,6 +110,8 @@ if saveddata_connectionstring is not None:
         saveddata_engine = create_engine(creator=saveddata_connectionstring, echo=config.debug)
     else:
         saveddata_engine = create_engine(saveddata_connectionstring, echo=config.debug)
+        if config.saveddataWal and isFileDatabase(saveddata_connectionstring):
+            enableWal(saveddata_engine)
 
     saveddata_meta = MetaData()
     saveddata_meta.bind = saveddata_engine
@@ -0,0 +1,104 @@
+# ===============================================================================
+# Copyright (C) 2010 Diego Duclos
+#
+# This file is part of eos.
+#
+# eos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# eos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with eos.  If not, see <http://www.gnu.org/licenses/>.
+# ===============================================================================
+
+import threading
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from utils.compat import OrderedDict
+
+
+class QueryCache(object):
+    """
+    Size-bounded least-recently-used cache for query results.
+
+    Keeps hit / miss / eviction counters so cache sizes can be tuned from real
+    sessions. All operations are guarded by a lock, as queries are issued from
+    the GUI thread as well as from service worker threads.
+    """
+
+    # Sentinel to tell apart cached None results from missing entries
+    MISSING = object()
+
+    def __init__(self, name, maxSize=None):
+        self.name = name
+        # None means unbounded
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__data = OrderedDict()
+        self.__lock = threading.RLock()
+
+    def get(self, key):
+        with self.__lock:
+            value = self.__data.pop(key, self.MISSING)
+            if value is self.MISSING:
+                self.misses += 1
+            else:
+                # Re-insert to mark entry as most recently used
+                self.__data[key] = value
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.__lock:
+            self.__data.pop(key, None)
+            self.__data[key] = value
+            if self.maxSize is not None:
+                while len(self.__data) > self.maxSize:
+                    self.__data.popitem(last=False)
+                    self.evictions += 1
+
+    def invalidate(self, key=MISSING):
+        """Drop single entry if key is provided, otherwise drop everything"""
+        with self.__lock:
+            if key is self.MISSING:
+                self.__data.clear()
+            else:
+                self.__data.pop(key, None)
+
+    def resetStats(self):
+        with self.__lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __contains__(self, key):
+        return key in self.__data
+
+    @property
+    def stats(self):
+        with self.__lock:
+            return {
+                "hits"     : self.hits,
+                "misses"   : self.misses,
+                "evictions": self.evictions,
+                "size"     : len(self.__data),
+                "maxSize"  : self.maxSize,
+            }
+
+    def __repr__(self):
+        return "QueryCache(name={}, size={}, maxSize={}) at {}".format(
+                self.name, len(self.__data), self.maxSize, hex(id(self))
+        )
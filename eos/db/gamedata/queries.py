@@ -17,21 +17,44 @@
 # along with eos.  If not, see <http://www.gnu.org/licenses/>.
 # ===============================================================================
 
+import threading
+from collections import namedtuple
+
 from sqlalchemy.orm import join, exc
 from sqlalchemy.sql import and_, or_, select
 
 import eos.config
 from eos.db import gamedata_session
+from eos.db.cache import QueryCache
+from eos.db.gamedata.attribute import attributes_table, typeattributes_table
+from eos.db.gamedata.category import categories_table
+from eos.db.gamedata.effect import effects_table, typeeffects_table
 from eos.db.gamedata.metaGroup import metatypes_table, items_table
 from eos.db.gamedata.group import groups_table
+from eos.db.gamedata.icon import icons_table
+from eos.db.gamedata.unit import groups_table as units_table
 from eos.db.util import processEager, processWhere
 from eos.gamedata import AlphaClone, Attribute, Category, Group, Item, MarketGroup, MetaGroup, AttributeInfo, MetaData
 
+# Maximum amount of entries kept per cached query function, functions not
+# listed here use the default. Search results depend on arbitrary user input,
+# thus they get a small cache which is not allowed to grow for days
+QUERY_CACHE_SIZES = {
+    "searchItems"           : 50,
+    "getVariations"         : 500,
+    "directAttributeRequest": 2000,
+}
+QUERY_CACHE_DEFAULT_SIZE = 10000
+
+# Query function name: QueryCache object
+queryCaches = {}
+
 configVal = getattr(eos.config, "gamedataCache", None)
 if configVal is True:
     def cachedQuery(amount, *keywords):
         def deco(function):
-            cache = {}
+            name = function.__name__
+            cache = queryCaches[name] = QueryCache(name, QUERY_CACHE_SIZES.get(name, QUERY_CACHE_DEFAULT_SIZE))
 
             def checkAndReturn(*args, **kwargs):
                 useCache = kwargs.pop("useCache", True)
@@ -41,12 +64,16 @@ if configVal is True:
                     cacheKey.append(kwargs.get(keyword))
 
                 cacheKey = tuple(cacheKey)
-                handler = cache.get(cacheKey)
-                if handler is None or not useCache:
-                    handler = cache[cacheKey] = function(*args, **kwargs)
+                handler = cache.get(cacheKey) if useCache else QueryCache.MISSING
+                if handler is QueryCache.MISSING:
+                    handler = function(*args, **kwargs)
+                    cache.set(cacheKey, handler)
 
                 return handler
 
+            checkAndReturn.cache = cache
+            checkAndReturn.__name__ = name
+            checkAndReturn.__doc__ = function.__doc__
             return checkAndReturn
 
         return deco
@@ -64,6 +91,29 @@ else:
         return deco
 
 
+def getQueryCacheStats(name=None):
+    """
+    Return hit / miss / eviction counters and sizes of gamedata query caches,
+    either for the single query function passed by name or for all of them.
+    """
+    if name is not None:
+        cache = queryCaches.get(name)
+        return cache.stats if cache is not None else None
+    return dict((cacheName, cache.stats) for cacheName, cache in queryCaches.iteritems())
+
+
+def clearQueryCache(name=None, resetStats=False):
+    """Invalidate cached results of the given query function, or of all of them"""
+    if name is not None:
+        caches = (queryCaches[name],) if name in queryCaches else ()
+    else:
+        caches = queryCaches.itervalues()
+    for cache in caches:
+        cache.invalidate()
+        if resetStats:
+            cache.resetStats()
+
+
 def sqlizeString(line):
     # Escape backslashes first, as they will be as escape symbol in queries
     # Then escape percent and underscore signs
@@ -249,6 +299,69 @@ def searchItems(nameLike, where=None, join=None, eager=None):
     return items
 
 
+def getItems(itemIDs, eager=None):
+    """Fetch multiple items with single query, order of passed IDs is not preserved"""
+    for itemID in itemIDs:
+        if not isinstance(itemID, int):
+            raise TypeError("All passed item IDs must be integers")
+    if len(itemIDs) == 0:
+        return []
+    return gamedata_session.query(Item).options(*processEager(eager)).filter(Item.ID.in_(tuple(itemIDs))).all()
+
+
+def getItemSearchData():
+    """
+    Return (typeID, typeName, published, groupID, groupName, categoryID, categoryName)
+    rows for all items, without creating any ORM objects
+    """
+    q = select((items_table.c.typeID, items_table.c.typeName, items_table.c.published,
+                groups_table.c.groupID, groups_table.c.groupName,
+                categories_table.c.categoryID, categories_table.c.categoryName),
+               from_obj=[items_table.join(groups_table, items_table.c.groupID == groups_table.c.groupID)
+                                    .join(categories_table, groups_table.c.categoryID == categories_table.c.categoryID)])
+    return gamedata_session.execute(q).fetchall()
+
+
+def getCategoryAttributeValues(categoryIDs, names=(), prefixes=()):
+    """
+    Return (typeID, attributeName, value) rows for all items of given categories.
+    Attributes are picked by exact name or by name prefix.
+    """
+    attrFilters = []
+    if names:
+        attrFilters.append(attributes_table.c.attributeName.in_(tuple(names)))
+    for prefix in prefixes:
+        attrFilters.append(attributes_table.c.attributeName.like(prefix + "%"))
+    if not attrFilters:
+        return []
+    q = select((typeattributes_table.c.typeID, attributes_table.c.attributeName, typeattributes_table.c.value),
+               and_(or_(*attrFilters), groups_table.c.categoryID.in_(tuple(categoryIDs))),
+               from_obj=[typeattributes_table
+                         .join(attributes_table, typeattributes_table.c.attributeID == attributes_table.c.attributeID)
+                         .join(items_table, typeattributes_table.c.typeID == items_table.c.typeID)
+                         .join(groups_table, items_table.c.groupID == groups_table.c.groupID)])
+    return gamedata_session.execute(q).fetchall()
+
+
+def getCategoryVolumes(categoryIDs):
+    """Return (typeID, volume) rows for all items of given categories"""
+    q = select((items_table.c.typeID, items_table.c.volume),
+               groups_table.c.categoryID.in_(tuple(categoryIDs)),
+               from_obj=[items_table.join(groups_table, items_table.c.groupID == groups_table.c.groupID)])
+    return gamedata_session.execute(q).fetchall()
+
+
+def getCategoryEffectNames(categoryIDs, names):
+    """Return (typeID, effectName) rows for items of given categories which have any of given effects"""
+    q = select((typeeffects_table.c.typeID, effects_table.c.effectName),
+               and_(effects_table.c.effectName.in_(tuple(names)), groups_table.c.categoryID.in_(tuple(categoryIDs))),
+               from_obj=[typeeffects_table
+                         .join(effects_table, typeeffects_table.c.effectID == effects_table.c.effectID)
+                         .join(items_table, typeeffects_table.c.typeID == items_table.c.typeID)
+                         .join(groups_table, items_table.c.groupID == groups_table.c.groupID)])
+    return gamedata_session.execute(q).fetchall()
+
+
 @cachedQuery(2, "where", "itemids")
 def getVariations(itemids, groupIDs=None, where=None, eager=None):
     for itemid in itemids:
@@ -291,6 +404,128 @@ def getAttributeInfo(attr, eager=None):
     return result
 
 
+# Compact, read-only attribute metadata used on hot paths (calculation engine,
+# item stats, export), so that they do not have to go to the database per key
+AttributeMeta = namedtuple("AttributeMeta", ("ID", "name", "displayName", "defaultValue", "maxAttributeID",
+                                             "cappingName", "highIsGood", "published", "iconID", "iconFile",
+                                             "unitID", "unitName", "unitDisplayName"))
+
+attributeMetaByID = {}
+attributeMetaByName = {}
+attributeMetaLock = threading.Lock()
+
+
+def loadAttributeMeta(force=False):
+    """Load metadata of all attributes with single query, if it's not loaded yet"""
+    with attributeMetaLock:
+        if attributeMetaByID and not force:
+            return
+        q = select((attributes_table.c.attributeID, attributes_table.c.attributeName, attributes_table.c.displayName,
+                    attributes_table.c.defaultValue, attributes_table.c.maxAttributeID,
+                    attributes_table.c.highIsGood, attributes_table.c.published, attributes_table.c.iconID,
+                    icons_table.c.iconFile, attributes_table.c.unitID, units_table.c.unitName,
+                    units_table.c.displayName),
+                   from_obj=[attributes_table
+                             .outerjoin(units_table, attributes_table.c.unitID == units_table.c.unitID)
+                             .outerjoin(icons_table, attributes_table.c.iconID == icons_table.c.iconID)])
+        rows = gamedata_session.execute(q).fetchall()
+        names = dict((row[0], row[1]) for row in rows)
+        byID = {}
+        byName = {}
+        for (ID, name, displayName, default, maxID, highIsGood, published, iconID, iconFile, unitID, unitName,
+             unitDisplayName) in rows:
+            meta = AttributeMeta(ID, name, displayName, default if default is not None else 0.0, maxID,
+                                 names.get(maxID) if maxID is not None else None, highIsGood, published, iconID,
+                                 iconFile, unitID, unitName, unitDisplayName)
+            byID[ID] = meta
+            byName[name] = meta
+        attributeMetaByName.clear()
+        attributeMetaByName.update(byName)
+        attributeMetaByID.clear()
+        attributeMetaByID.update(byID)
+
+
+def getAttributeMeta(attr):
+    """Get metadata of attribute by its ID or name, None if there's no such attribute"""
+    if not attributeMetaByID:
+        loadAttributeMeta()
+    if isinstance(attr, basestring):
+        return attributeMetaByName.get(attr)
+    elif isinstance(attr, int):
+        return attributeMetaByID.get(attr)
+    else:
+        raise TypeError("Need integer or string as argument")
+
+
+# Pairs of attribute IDs which define required skills of an item
+# (requiredSkillX, requiredSkillXLevel), in order of their importance
+REQUIRED_SKILL_ATTRS = ((182, 277), (183, 278), (184, 279), (1285, 1286), (1289, 1287), (1290, 1288))
+
+# {typeID: ((skillID, level), ...)}, built once per gamedata version
+requiredSkillsIndex = {}
+# {skill name: skillID} and {skillID: skill name} for all skills referenced by index
+requiredSkillIDsByName = {}
+requiredSkillNamesByID = {}
+requiredSkillsState = {"version": None, "loaded": False}
+requiredSkillsLock = threading.Lock()
+
+
+def loadRequiredSkills(force=False):
+    """Build required skills index for all items with two queries, if it's not built for current gamedata yet"""
+    with requiredSkillsLock:
+        version = eos.config.gamedata_version
+        if requiredSkillsState["loaded"] and requiredSkillsState["version"] == version and not force:
+            return
+        index = {}
+        skillIDs = set()
+        levelAttrs = dict(REQUIRED_SKILL_ATTRS)
+        attrIDs = tuple(levelAttrs.iterkeys()) + tuple(levelAttrs.itervalues())
+        q = select((typeattributes_table.c.typeID, typeattributes_table.c.attributeID, typeattributes_table.c.value),
+                   typeattributes_table.c.attributeID.in_(attrIDs))
+        # {typeID: {attributeID: value}}
+        typeAttrs = {}
+        for typeID, attrID, value in gamedata_session.execute(q):
+            typeAttrs.setdefault(typeID, {})[attrID] = value
+
+        for typeID, attrs in typeAttrs.iteritems():
+            reqs = []
+            for skillAttr, levelAttr in REQUIRED_SKILL_ATTRS:
+                if skillAttr in attrs and levelAttr in attrs:
+                    skillID = int(attrs[skillAttr])
+                    reqs.append((skillID, attrs[levelAttr]))
+                    skillIDs.add(skillID)
+            if reqs:
+                index[typeID] = tuple(reqs)
+
+        names = {}
+        if skillIDs:
+            q = select((items_table.c.typeID, items_table.c.typeName), items_table.c.typeID.in_(tuple(skillIDs)))
+            names = dict(gamedata_session.execute(q).fetchall())
+
+        requiredSkillsIndex.clear()
+        requiredSkillsIndex.update(index)
+        requiredSkillNamesByID.clear()
+        requiredSkillNamesByID.update(names)
+        requiredSkillIDsByName.clear()
+        requiredSkillIDsByName.update((name, ID) for ID, name in names.iteritems())
+        requiredSkillsState["version"] = version
+        requiredSkillsState["loaded"] = True
+
+
+def getRequiredSkills(typeID):
+    """Return tuple of (skillID, level) pairs directly required by the type"""
+    if not requiredSkillsState["loaded"]:
+        loadRequiredSkills()
+    return requiredSkillsIndex.get(typeID, ())
+
+
+def getRequiredSkillID(name):
+    """Return ID of skill with given name, if any item in gamedata requires it"""
+    if not requiredSkillsState["loaded"]:
+        loadRequiredSkills()
+    return requiredSkillIDsByName.get(name)
+
+
 @cachedQuery(1, "field")
 def getMetaData(field):
     if isinstance(field, basestring):
@@ -32,6 +32,9 @@ def update(saveddata_engine):
             appVersion,
             time.strftime("%Y%m%d_%H%M%S"))
 
+        # In WAL mode latest commits may still be only in the -wal file, move
+        # them into database file so backup has them. No-op in other modes
+        saveddata_engine.execute("PRAGMA wal_checkpoint(TRUNCATE)")
         shutil.copyfile(config.saveDB, toFile)
 
         for version in xrange(dbVersion, appVersion):
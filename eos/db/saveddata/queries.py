@@ -17,6 +17,8 @@
 # along with eos.  If not, see <http://www.gnu.org/licenses/>.
 # ===============================================================================
 
+import threading
+
 from sqlalchemy.sql import and_
 
 from eos.db import saveddata_session, sd_lock
@@ -41,28 +43,35 @@ if configVal is True:
 
     itemCache = {}
     queryCache = {}
+    # Reverse index, allows to find cached queries which hold given ID without
+    # scanning all of them: {type: {ID: set((function, cacheKey))}}
+    keyIndex = {}
 
     def cachedQuery(type, amount, *keywords):
-        itemCache[type] = localItemCache = weakref.WeakValueDictionary()
-        queryCache[type] = typeQueryCache = {}
+        localItemCache = itemCache.setdefault(type, weakref.WeakValueDictionary())
+        typeQueryCache = queryCache.setdefault(type, {})
+        typeKeyIndex = keyIndex.setdefault(type, {})
 
         def deco(function):
             localQueryCache = typeQueryCache[function] = {}
 
             def setCache(cacheKey, args, kwargs):
                 items = function(*args, **kwargs)
+                uncacheEntry(typeKeyIndex, function, localQueryCache, cacheKey)
                 IDs = set()
-                localQueryCache[cacheKey] = (isinstance(items, list), IDs)
                 stuff = items if isinstance(items, list) else (items,)
                 for item in stuff:
                     ID = getattr(item, "ID", None)
                     if ID is None:
                         # Some uncachable data, don't cache this query
-                        del localQueryCache[cacheKey]
-                        break
+                        return items
                     localItemCache[ID] = item
                     IDs.add(ID)
 
+                localQueryCache[cacheKey] = (isinstance(items, list), IDs)
+                for ID in IDs:
+                    typeKeyIndex.setdefault(ID, set()).add((function, cacheKey))
+
                 return items
 
             def checkAndReturn(*args, **kwargs):
@@ -101,22 +110,29 @@ if configVal is True:
 
         return deco
 
+    def uncacheEntry(typeKeyIndex, function, localQueryCache, cacheKey):
+        """Remove cached query and all references to it from the reverse index"""
+        info = localQueryCache.pop(cacheKey, None)
+        if info is None:
+            return
+        for ID in info[1]:
+            keys = typeKeyIndex.get(ID)
+            if keys is None:
+                continue
+            keys.discard((function, cacheKey))
+            if not keys:
+                del typeKeyIndex[ID]
+
     def removeCachedEntry(type, ID):
         if type not in queryCache:
             return
         functionCache = queryCache[type]
-        for _, localCache in functionCache.iteritems():
-            toDelete = set()
-            for cacheKey, info in localCache.iteritems():
-                IDs = info[1]
-                if ID in IDs:
-                    toDelete.add(cacheKey)
+        typeKeyIndex = keyIndex[type]
+        for function, cacheKey in tuple(typeKeyIndex.get(ID, ())):
+            uncacheEntry(typeKeyIndex, function, functionCache[function], cacheKey)
 
-            for cacheKey in toDelete:
-                del localCache[cacheKey]
-
-            if ID in itemCache[type]:
-                del itemCache[type][ID]
+        if ID in itemCache[type]:
+            del itemCache[type][ID]
 
 elif callable(configVal):
     cachedQuery, removeCachedEntry = eos.config.gamedataCache
@@ -303,6 +319,12 @@ def getFitList(eager=None):
     return fits
 
 
+def getFitIDs():
+    """Get IDs of all fits without loading fits themselves"""
+    with sd_lock:
+        return [row[0] for row in saveddata_session.query(Fit.ID).order_by(Fit.ID)]
+
+
 @cachedQuery(Price, 1, "typeID")
 def getPrice(typeID):
     if isinstance(typeID, int):
@@ -313,6 +335,18 @@ def getPrice(typeID):
     return price
 
 
+def getPrices(typeIDs):
+    """Get stored prices of typeIDs with as few queries as possible, returns {typeID: price}"""
+    typeIDs = list(typeIDs)
+    prices = {}
+    with sd_lock:
+        # Stay well below SQLite limit on number of query parameters
+        for i in xrange(0, len(typeIDs), 500):
+            for price in saveddata_session.query(Price).filter(Price.typeID.in_(typeIDs[i:i + 500])):
+                prices[price.typeID] = price
+    return prices
+
+
 def clearPrices():
     with sd_lock:
         deleted_rows = saveddata_session.query(Price).delete()
@@ -470,10 +504,49 @@ def getOverrides(itemID, eager=None):
         raise TypeError("Need integer as argument")
 
 
+# Overrides of all items loaded with single query: {itemID: {attribute name: Override}}.
+# Per-item dictionaries are handed out to items as is, thus changes made by items
+# are written through to the index, and loading the index fills already handed
+# out dictionaries in place
+overridesIndex = {}
+overridesState = {"loaded": False}
+
+
+def loadOverrides(force=False):
+    if overridesState["loaded"] and not force:
+        return
+    # No session lock here, items request their overrides while fits are being
+    # loaded, when the lock is already held
+    overrides = saveddata_session.query(Override).all()
+    for itemOverrides in overridesIndex.itervalues():
+        itemOverrides.clear()
+    for x in overrides:
+        # Skip overrides of items or attributes which are not in gamedata anymore
+        if x.attr is None or x.item is None or x.attr.name not in x.item.attributes:
+            continue
+        overridesIndex.setdefault(x.itemID, {})[x.attr.name] = x
+    overridesState["loaded"] = True
+
+
+def getItemOverrides(itemID, load=True):
+    """
+    Return {attribute name: Override} map for given item. When load is False and
+    overrides were not loaded yet, returned map is filled later by loadOverrides
+    """
+    if isinstance(itemID, int):
+        if load:
+            loadOverrides()
+        return overridesIndex.setdefault(itemID, {})
+    else:
+        raise TypeError("Need integer as argument")
+
+
 def clearOverrides():
     with sd_lock:
         deleted_rows = saveddata_session.query(Override).delete()
     commit()
+    for itemOverrides in overridesIndex.itervalues():
+        itemOverrides.clear()
     return deleted_rows
 
 
@@ -502,6 +575,32 @@ def save(stuff):
     commit()
 
 
+def saveAll(stuff):
+    """Add all objects to session and commit them in single transaction"""
+    with sd_lock:
+        saveddata_session.add_all(stuff)
+        saveddata_session.commit()
+        saveddata_session.flush()
+
+
+def addAll(stuff):
+    """
+    Add all objects to session and flush them without committing, so that
+    queries find them even before the commit
+    """
+    with sd_lock:
+        saveddata_session.add_all(stuff)
+        saveddata_session.flush()
+
+
+def detach(stuff):
+    """Remove objects from session, next query for them loads fresh copies"""
+    with sd_lock:
+        for obj in stuff:
+            if obj in saveddata_session:
+                saveddata_session.expunge(obj)
+
+
 def remove(stuff):
     removeCachedEntry(type(stuff), stuff.ID)
     with sd_lock:
@@ -509,7 +608,47 @@ def remove(stuff):
     commit()
 
 
+# Write-behind commit state: if there are requested changes which aren't
+# committed yet, and function which schedules their commit
+commitState = {"pending": False, "scheduler": None}
+commitStateLock = threading.Lock()
+
+
+def setCommitScheduler(scheduler):
+    """
+    Scheduler is called with flushCommits when first change is requested to
+    be committed, and has to call it some time later. Without scheduler
+    requested changes are committed right away.
+    """
+    commitState["scheduler"] = scheduler
+
+
+def requestCommit():
+    """Commit changes in write-behind manner, changes made in quick succession share one commit"""
+    schedule = False
+    with commitStateLock:
+        scheduler = commitState["scheduler"]
+        if scheduler is not None:
+            schedule = not commitState["pending"]
+            commitState["pending"] = True
+    if scheduler is None:
+        commit()
+    elif schedule:
+        scheduler(flushCommits)
+
+
+def flushCommits():
+    """Commit changes waiting for write-behind commit, if there are any"""
+    with commitStateLock:
+        pending = commitState["pending"]
+    if pending:
+        commit()
+
+
 def commit():
+    # Any commit takes pending write-behind changes with it
+    with commitStateLock:
+        commitState["pending"] = False
     with sd_lock:
         saveddata_session.commit()
         saveddata_session.flush()
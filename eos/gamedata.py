@@ -23,6 +23,7 @@ from sqlalchemy.orm import reconstructor
 
 import eos.db
 from eqBase import EqBase
+from eos.modifiedAttributeDict import ModifiedAttributeDict
 
 try:
     from collections import OrderedDict
@@ -258,26 +259,25 @@ class Item(EqBase):
     @property
     def overrides(self):
         if self.__overrides is None:
-            self.__overrides = {}
-            overrides = eos.db.getOverrides(self.ID)
-            for x in overrides:
-                if x.attr.name in self.__attributes:
-                    self.__overrides[x.attr.name] = x
+            # Map is shared with bulk-loaded overrides index; do not hit the
+            # database at all while overrides are disabled
+            self.__overrides = eos.db.getItemOverrides(self.ID, load=ModifiedAttributeDict.OVERRIDES)
 
         return self.__overrides
 
     def setOverride(self, attr, value):
         from eos.saveddata.override import Override
-        if attr.name in self.__overrides:
-            override = self.__overrides.get(attr.name)
+        overrides = self.overrides
+        if attr.name in overrides:
+            override = overrides.get(attr.name)
             override.value = value
         else:
             override = Override(self, attr, value)
-            self.__overrides[attr.name] = override
+            overrides[attr.name] = override
         eos.db.save(override)
 
     def deleteOverride(self, attr):
-        override = self.__overrides.pop(attr.name, None)
+        override = self.overrides.pop(attr.name, None)
         eos.db.saveddata_session.delete(override)
         eos.db.commit()
 
@@ -285,30 +285,13 @@ class Item(EqBase):
     def requiredSkills(self):
         if self.__requiredSkills is None:
             requiredSkills = OrderedDict()
+            # Required skill IDs and levels come from index built for all items at once
+            for skillID, skillLvl in eos.db.getRequiredSkills(self.ID):
+                # Fetch item from database and fill map
+                item = eos.db.getItem(skillID)
+                requiredSkills[item] = skillLvl
             self.__requiredSkills = requiredSkills
-            # Map containing attribute IDs we may need for required skills
-            # { requiredSkillX : requiredSkillXLevel }
-            srqIDMap = {182: 277, 183: 278, 184: 279, 1285: 1286, 1289: 1287, 1290: 1288}
-            combinedAttrIDs = set(srqIDMap.iterkeys()).union(set(srqIDMap.itervalues()))
-            # Map containing result of the request
-            # { attributeID : attributeValue }
-            skillAttrs = {}
-            # Get relevant attribute values from db (required skill IDs and levels) for our item
-            for attrInfo in eos.db.directAttributeRequest((self.ID,), tuple(combinedAttrIDs)):
-                attrID = attrInfo[1]
-                attrVal = attrInfo[2]
-                skillAttrs[attrID] = attrVal
-            # Go through all attributeID pairs
-            for srqIDAtrr, srqLvlAttr in srqIDMap.iteritems():
-                # Check if we have both in returned result
-                if srqIDAtrr in skillAttrs and srqLvlAttr in skillAttrs:
-                    skillID = int(skillAttrs[srqIDAtrr])
-                    skillLvl = skillAttrs[srqLvlAttr]
-                    # Fetch item from database and fill map
-                    item = eos.db.getItem(skillID)
-                    requiredSkills[item] = skillLvl
         return self.__requiredSkills
-
     factionMap = {
         500001: "caldari",
         500002: "minmatar",
@@ -402,19 +385,22 @@ class Item(EqBase):
         return self.__offensive
 
     def requiresSkill(self, skill, level=None):
-        for s, l in self.requiredSkills.iteritems():
-            if isinstance(skill, basestring):
-                if s.name == skill and (level is None or l == level):
-                    return True
-
-            elif isinstance(skill, int) and (level is None or l == level):
-                if s.ID == skill:
-                    return True
+        if isinstance(skill, basestring):
+            skillID = eos.db.getRequiredSkillID(skill)
+        elif isinstance(skill, int):
+            skillID = skill
+        elif isinstance(skill, Item):
+            skillID = skill.ID
+        elif hasattr(skill, "item"):
+            skillID = skill.item.ID
+        else:
+            return False
 
-            elif skill == s and (level is None or l == level):
-                return True
+        if skillID is None:
+            return False
 
-            elif hasattr(skill, "item") and skill.item == s and (level is None or l == level):
+        for s, l in eos.db.getRequiredSkills(self.ID):
+            if s == skillID and (level is None or l == level):
                 return True
 
         return False
@@ -152,18 +152,10 @@ class ModifiedAttributeDict(collections.MutableMapping):
         try:
             cappingKey = cappingAttrKeyCache[key]
         except KeyError:
-            from eos.db.gamedata.queries import getAttributeInfo
-            attrInfo = getAttributeInfo(key)
-            if attrInfo is None:
-                cappingId = cappingAttrKeyCache[key] = None
-            else:
-                # see GH issue #620
-                cappingId = cappingAttrKeyCache[key] = attrInfo.maxAttributeID
-            if cappingId is None:
-                cappingKey = None
-            else:
-                cappingAttrInfo = getAttributeInfo(cappingId)
-                cappingKey = None if cappingAttrInfo is None else cappingAttrInfo.name
+            from eos.db.gamedata.queries import getAttributeMeta
+            attrMeta = getAttributeMeta(key)
+            # see GH issue #620
+            cappingKey = cappingAttrKeyCache[key] = None if attrMeta is None else attrMeta.cappingName
 
         if cappingKey:
             if cappingKey in self.original:
@@ -193,13 +185,9 @@ class ModifiedAttributeDict(collections.MutableMapping):
         try:
             default = defaultValuesCache[key]
         except KeyError:
-            from eos.db.gamedata.queries import getAttributeInfo
-            attrInfo = getAttributeInfo(key)
-            if attrInfo is None:
-                default = defaultValuesCache[key] = 0.0
-            else:
-                dv = attrInfo.defaultValue
-                default = defaultValuesCache[key] = dv if dv is not None else 0.0
+            from eos.db.gamedata.queries import getAttributeMeta
+            attrMeta = getAttributeMeta(key)
+            default = defaultValuesCache[key] = 0.0 if attrMeta is None else attrMeta.defaultValue
         val = self.__intermediary[key] if key in self.__intermediary else self.__preAssigns[
             key] if key in self.__preAssigns else self.getOriginal(key) if key in self.__original else default
 
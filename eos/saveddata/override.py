@@ -41,7 +41,7 @@ class Override(EqBase):
         self.__item = None
 
         if self.attrID:
-            self.__attr = eos.db.getAttributeInfo(self.attrID)
+            self.__attr = eos.db.getAttributeMeta(self.attrID)
             if self.__attr is None:
                 pyfalog.error("Attribute (id: {0}) does not exist", self.attrID)
                 return
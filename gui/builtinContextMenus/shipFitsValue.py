@@ -0,0 +1,28 @@
+from gui.contextMenu import ContextMenu
+import gui.mainFrame
+# noinspection PyPackageRequirements
+import wx
+from service.settings import ContextMenuSettings
+from service.valuation import Valuation
+
+
+class ShipFitsValue(ContextMenu):
+    def __init__(self):
+        self.mainFrame = gui.mainFrame.MainFrame.getInstance()
+        self.settings = ContextMenuSettings.getInstance()
+
+    def display(self, srcContext, selection):
+        if not self.settings.get('shipFitsValue'):
+            return False
+
+        return srcContext == "baseShip"
+
+    def getText(self, itmContext, selection):
+        return "Value All Fits"
+
+    def activate(self, fullContext, selection, i):
+        self.mainFrame.waitDialog = wx.BusyInfo("Fetching prices...")
+        Valuation.getInstance().valueShipFits(selection[0].ID, self.mainFrame.openFitsValued)
+
+
+ShipFitsValue.register()
@@ -55,7 +55,7 @@ class FitDpsGraph(Graph):
         icons = {}
         sAttr = Attribute.getInstance()
         for key, attrName in self.propertyAttributeMap.iteritems():
-            iconFile = sAttr.getAttributeInfo(attrName).icon.iconFile
+            iconFile = sAttr.getAttributeMeta(attrName).iconFile
             bitmap = BitmapLoader.getBitmap(iconFile, "icons")
             if bitmap:
                 icons[key] = bitmap
@@ -89,6 +89,20 @@ class PFGeneralPref(PreferenceView):
 
         mainSizer.Add(priceSizer, 0, wx.ALL | wx.EXPAND, 0)
 
+        priceFileSizer = wx.BoxSizer(wx.HORIZONTAL)
+
+        self.stPriceFile = wx.StaticText(panel, wx.ID_ANY, u"Local price file:", wx.DefaultPosition, wx.DefaultSize, 0)
+        self.stPriceFile.Wrap(-1)
+        self.stPriceFile.SetToolTip(wx.ToolTip(u"Text file with \"typeID,price\" lines. Items found in it are priced "
+                                               u"from the file, without going to network"))
+        priceFileSizer.Add(self.stPriceFile, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+
+        self.fpPriceFile = wx.FilePickerCtrl(panel, wx.ID_ANY, wildcard=u"Price file (*.csv;*.txt)|*.csv;*.txt",
+                                             style=wx.FLP_OPEN | wx.FLP_FILE_MUST_EXIST | wx.FLP_USE_TEXTCTRL)
+        priceFileSizer.Add(self.fpPriceFile, 1, wx.ALL | wx.EXPAND, 5)
+
+        mainSizer.Add(priceFileSizer, 0, wx.ALL | wx.EXPAND, 0)
+
         self.sFit = Fit.getInstance()
 
         self.cbGlobalChar.SetValue(self.sFit.serviceFittingOptions["useGlobalCharacter"])
@@ -104,6 +118,7 @@ class PFGeneralPref(PreferenceView):
         self.cbExportCharges.SetValue(self.sFit.serviceFittingOptions["exportCharges"])
         self.cbOpenFitInNew.SetValue(self.sFit.serviceFittingOptions["openFitInNew"])
         self.chPriceSystem.SetStringSelection(self.sFit.serviceFittingOptions["priceSystem"])
+        self.fpPriceFile.SetPath(self.sFit.serviceFittingOptions["priceFile"])
 
         self.cbGlobalChar.Bind(wx.EVT_CHECKBOX, self.OnCBGlobalCharStateChange)
         self.cbGlobalDmgPattern.Bind(wx.EVT_CHECKBOX, self.OnCBGlobalDmgPatternStateChange)
@@ -118,6 +133,7 @@ class PFGeneralPref(PreferenceView):
         self.cbExportCharges.Bind(wx.EVT_CHECKBOX, self.onCBExportCharges)
         self.cbOpenFitInNew.Bind(wx.EVT_CHECKBOX, self.onCBOpenFitInNew)
         self.chPriceSystem.Bind(wx.EVT_CHOICE, self.onPriceSelection)
+        self.fpPriceFile.Bind(wx.EVT_FILEPICKER_CHANGED, self.onPriceFileChange)
 
         self.cbRackLabels.Enable(self.sFit.serviceFittingOptions["rackSlots"] or False)
 
@@ -195,5 +211,20 @@ class PFGeneralPref(PreferenceView):
         wx.PostEvent(self.mainFrame, GE.FitChanged(fitID=fitID))
         event.Skip()
 
+    def onPriceFileChange(self, event):
+        path = self.fpPriceFile.GetPath()
+        self.sFit.serviceFittingOptions["priceFile"] = path
+        Price.setLocalFile(path)
+
+        # Prices fetched before are still valid, drop them so that file is used right away
+        fitID = self.mainFrame.getActiveFit()
+
+        sMkt = Market.getInstance()
+        sMkt.clearPriceCache()
+
+        self.sFit.refreshFit(fitID)
+        wx.PostEvent(self.mainFrame, GE.FitChanged(fitID=fitID))
+        event.Skip()
+
 
 PFGeneralPref.register()
@@ -34,14 +34,14 @@ class AttributeDisplay(ViewColumn):
     def __init__(self, fittingView, params):
         ViewColumn.__init__(self, fittingView)
         sAttr = Attribute.getInstance()
-        info = sAttr.getAttributeInfo(params["attribute"])
+        info = sAttr.getAttributeMeta(params["attribute"])
         self.info = info
         if params["showIcon"]:
             if info.name == "power":
                 iconFile = "pg_small"
                 iconType = "gui"
             else:
-                iconFile = info.icon.iconFile if info.icon else None
+                iconFile = info.iconFile
                 iconType = "icons"
             if iconFile:
                 self.imageId = fittingView.imageList.GetImageIndex(iconFile, iconType)
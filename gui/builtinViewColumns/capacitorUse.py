@@ -21,7 +21,6 @@
 import wx
 
 from eos.saveddata.mode import Mode
-from service.attribute import Attribute
 from gui.utils.numberFormatter import formatAmount
 from gui.viewColumn import ViewColumn
 from gui.bitmapLoader import BitmapLoader
@@ -35,7 +34,6 @@ class CapacitorUse(ViewColumn):
 
         self.mask = wx.LIST_MASK_IMAGE
 
-        Attribute.getInstance().getAttributeInfo("capacitorNeed")
         self.imageId = fittingView.imageList.GetImageIndex("capacitorRecharge_small", "gui")
         self.bitmap = BitmapLoader.getBitmap("capacitorRecharge_small", "gui")
 
@@ -37,10 +37,10 @@ class MaxRange(ViewColumn):
         ViewColumn.__init__(self, fittingView)
 
         sAttr = Attribute.getInstance()
-        info = sAttr.getAttributeInfo("maxRange")
+        info = sAttr.getAttributeMeta("maxRange")
         self.info = info
         if params["showIcon"]:
-            iconFile = info.icon.iconFile if info.icon else None
+            iconFile = info.iconFile
             if iconFile:
                 self.imageId = fittingView.imageList.GetImageIndex(iconFile, "icons")
                 self.bitmap = BitmapLoader.getBitmap(iconFile, "icons")
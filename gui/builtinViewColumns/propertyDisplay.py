@@ -31,7 +31,7 @@ class PropertyDisplay(ViewColumn):
         attributeSlave = params["attributeSlave"] or params["property"]
         # This function can throw an exception if the database isn't sane
         # We need to do a sanity check before this runs
-        info = sAttr.getAttributeInfo(attributeSlave)
+        info = sAttr.getAttributeMeta(attributeSlave)
 
         self.mask = 0
         self.propertyName = params["property"]
@@ -41,7 +41,7 @@ class PropertyDisplay(ViewColumn):
                 iconFile = "pg_small"
                 iconType = "gui"
             else:
-                iconFile = info.icon.iconFile if info.icon else None
+                iconFile = info.iconFile
                 iconType = "icons"
             if iconFile:
                 self.imageId = fittingView.imageList.GetImageIndex(iconFile, iconType)
@@ -205,4 +205,5 @@ from gui.builtinContextMenus import (  # noqa: E402,F401
     metaSwap,
     implantSets,
     fighterAbilities,
+    shipFitsValue,
 )
@@ -497,7 +497,7 @@ class ItemParams(wx.Panel):
             return "%s (%d)" % (group.name, value) if group is not None else str(value)
 
         def attributeIDCallback():
-            attribute = Attribute.getInstance().getAttributeInfo(value)
+            attribute = Attribute.getInstance().getAttributeMeta(value)
             return "%s (%d)" % (attribute.name.capitalize(), value)
 
         trans = {
@@ -692,7 +692,7 @@ class ItemCompare(wx.Panel):
             return "%s (%d)" % (group.name, value) if group is not None else str(value)
 
         def attributeIDCallback():
-            attribute = Attribute.getInstance().getAttributeInfo(value)
+            attribute = Attribute.getInstance().getAttributeMeta(value)
             return "%s (%d)" % (attribute.name.capitalize(), value)
 
         trans = {
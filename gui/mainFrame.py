@@ -66,13 +66,16 @@ from gui import graphFrame
 from service.settings import SettingsProvider
 from service.fit import Fit
 from service.character import Character
+from service.market import Market
 from service.update import Update
 
 # import this to access override setting
 from eos.modifiedAttributeDict import ModifiedAttributeDict
 from eos.db.saveddata.loadDefaultDatabaseValues import DefaultDatabaseValues
-from eos.db.saveddata.queries import getFit as db_getFit
+from eos.db.saveddata.queries import getFit as db_getFit, loadOverrides as db_loadOverrides, \
+    setCommitScheduler as db_setCommitScheduler, flushCommits as db_flushCommits
 from service.port import Port
+from service.valuation import Valuation
 from service.settings import HTMLExportSettings
 
 from time import gmtime, strftime
@@ -137,8 +140,60 @@ class OpenFitsThread(threading.Thread):
         wx.CallAfter(self.callback)
 
 
+class FitChangeCoalescer(wx.EvtHandler):
+    """
+    Pushed on top of main frame event handlers, holds FitChanged events back
+    until changes stop coming for DELAY ms. Then fit calculations deferred by
+    the fit service are done once, and views get single FitChanged per fit.
+    """
+
+    # Quiet period after last change, in ms
+    DELAY = 50
+
+    def __init__(self, frame):
+        wx.EvtHandler.__init__(self)
+        self.frame = frame
+        # IDs of changed fits, in order of their last change
+        self.fitIDs = []
+        self.timer = None
+        self.Bind(GE.FIT_CHANGED, self.fitChanged)
+
+    def fitChanged(self, event):
+        if getattr(event, "coalesced", False):
+            event.Skip()
+            return
+        if event.fitID in self.fitIDs:
+            self.fitIDs.remove(event.fitID)
+        self.fitIDs.append(event.fitID)
+        # Newer change cancels refresh scheduled for older ones
+        self.restart()
+
+    def scheduleRecalc(self, flush):
+        """Fit service recalc scheduler, deferred calculations are done on flush"""
+        if self.timer is None or not self.timer.IsRunning():
+            self.restart()
+
+    def restart(self):
+        if self.timer is None:
+            self.timer = wx.CallLater(self.DELAY, self.flush)
+        else:
+            self.timer.Restart(self.DELAY)
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.Stop()
+
+    def flush(self):
+        Fit.getInstance().flushRecalcs()
+        fitIDs, self.fitIDs = self.fitIDs, []
+        for fitID in fitIDs:
+            wx.PostEvent(self.frame, GE.FitChanged(fitID=fitID, coalesced=True))
+
+
 class MainFrame(wx.Frame):
     __instance = None
+    # Delay between first uncommitted fit change and commit, in ms
+    COMMIT_DELAY = 1000
 
     @classmethod
     def getInstance(cls):
@@ -225,11 +280,21 @@ class MainFrame(wx.Frame):
 
         self.Bind(wx.EVT_CLOSE, self.OnClose)
 
+        # Fit changes are committed in batches, shortly after first of them
+        db_setCommitScheduler(self.scheduleCommit)
+        # Bursts of fit changes are calculated and shown once
+        self.fitChangeCoalescer = FitChangeCoalescer(self)
+        self.PushEventHandler(self.fitChangeCoalescer)
+        Fit.getInstance().setRecalcScheduler(self.fitChangeCoalescer.scheduleRecalc)
+
         # Show ourselves
         self.Show()
 
         self.LoadPreviousOpenFits()
 
+        # Build market lookup tables while user is looking at the window
+        Market.getInstance().startWarmUp()
+
         # Check for updates
         self.sUpdate = Update.getInstance()
         self.sUpdate.CheckUpdate(self.ShowUpdateBox)
@@ -344,10 +409,25 @@ class MainFrame(wx.Frame):
             if m is not None:
                 self.prevOpenFits['pyfaOpenFits'].append(m())
 
+        # stop coalescing fit changes, calculate what's left
+        sFit = Fit.getInstance()
+        sFit.setRecalcScheduler(None)
+        sFit.flushRecalcs()
+        self.fitChangeCoalescer.stop()
+        self.PopEventHandler()
+
+        # commit fit changes which are waiting for write-behind
+        db_setCommitScheduler(None)
+        db_flushCommits()
+
         # save all teh settingz
         SettingsProvider.getInstance().saveAll()
         event.Skip()
 
+    def scheduleCommit(self, flush):
+        """Run saveddata commit in GUI thread COMMIT_DELAY ms later, may be called from any thread"""
+        wx.CallAfter(wx.CallLater, self.COMMIT_DELAY, flush)
+
     def ExitApp(self, event):
         self.Close()
         event.Skip()
@@ -488,6 +568,8 @@ class MainFrame(wx.Frame):
         self.Bind(wx.EVT_MENU, self.importFromClipboard, id=wx.ID_PASTE)
         # Backup fits
         self.Bind(wx.EVT_MENU, self.backupToXml, id=menuBar.backupFitsId)
+        # Value open fits
+        self.Bind(wx.EVT_MENU, self.valueOpenFits, id=menuBar.valueFitsId)
         # Export skills needed
         self.Bind(wx.EVT_MENU, self.exportSkillsNeeded, id=menuBar.exportSkillsNeededId)
         # Import character
@@ -652,6 +734,9 @@ class MainFrame(wx.Frame):
 
     def toggleOverrides(self, event):
         ModifiedAttributeDict.OVERRIDES = not ModifiedAttributeDict.OVERRIDES
+        if ModifiedAttributeDict.OVERRIDES:
+            # Fills override maps of already loaded items in place
+            db_loadOverrides()
         wx.PostEvent(self, GE.FitChanged(fitID=self.getActiveFit()))
         menu = self.GetMenuBar()
         menu.SetLabel(menu.toggleOverridesId,
@@ -730,14 +815,50 @@ class MainFrame(wx.Frame):
         fit = db_getFit(self.getActiveFit())
         toClipboard(Port.exportMultiBuy(fit))
 
+    def valueOpenFits(self, event):
+        fitIDs = []
+        for page in self.fitMultiSwitch.pages:
+            m = getattr(page, "getActiveFit", None)
+            if m is not None and m() is not None and m() not in fitIDs:
+                fitIDs.append(m())
+        if not fitIDs:
+            return
+        self.waitDialog = wx.BusyInfo("Fetching prices...")
+        Valuation.getInstance().valueFits(fitIDs, self.openFitsValued)
+
+    def openFitsValued(self, valuation):
+        self.closeWaitDialog()
+        toClipboard(valuation.exportMultiBuy())
+        wx.MessageBox("Combined multibuy was copied to the clipboard.\n\n" + valuation.exportTotals(),
+                      "Fitting values", wx.OK | wx.ICON_INFORMATION, self)
+
     def importFromClipboard(self, event):
         clipboard = fromClipboard()
-        try:
-            fits = Port().importFitFromBuffer(clipboard, self.getActiveFit())
-        except:
-            pyfalog.error("Attempt to import failed:\n{0}", clipboard)
-        else:
-            self._openAfterImport(fits)
+        if not clipboard:
+            return
+        self.waitDialog = wx.BusyInfo("Importing fits...")
+        Port.importFitsFromBufferThreaded(clipboard, self.getActiveFit(), self.clipboardImportCallback)
+
+    def clipboardImportCallback(self, action, data=None):
+        """
+        Receives the same actions as fileImportCallback. There's no progress
+        bar for clipboard import, so progress updates are ignored.
+        """
+        if action is None or action == 1:
+            return
+        if action == -3:
+            pyfalog.warning("Some of the fits were not imported from clipboard:\n{0}", data)
+            dlg = wx.MessageDialog(self,
+                                   "The following fits could not be imported\n\n%s" % data,
+                                   "Import Error", wx.OK | wx.ICON_WARNING)
+            dlg.ShowModal()
+            dlg.Destroy()
+            return
+        self.closeWaitDialog()
+        if action == -1:
+            self._openAfterImport(data)
+        elif action == -2:
+            pyfalog.error("Attempt to import failed:\n{0}", data)
 
     def exportToClipboard(self, event):
         CopySelectDict = {CopySelectDialog.copyFormatEft: self.clipboardEft,
@@ -891,6 +1012,7 @@ class MainFrame(wx.Frame):
         action : a flag that lets us know how to deal with :data
                 None: Pulse the progress bar
                 1: Replace message with data
+                -3: Some of the files failed while rest was imported, display errors
                 other: Close dialog and handle based on :action (-1 open fits, -2 display error)
         """
 
@@ -899,13 +1021,19 @@ class MainFrame(wx.Frame):
         elif action == 1 and data != self.progressDialog.message:
             self.progressDialog.message = data
             self.progressDialog.Pulse(data)
+        elif action == -3:
+            dlg = wx.MessageDialog(self,
+                                   "The following files could not be imported\n\n%s" % data,
+                                   "Import Error", wx.OK | wx.ICON_WARNING)
+            dlg.ShowModal()
+            dlg.Destroy()
         else:
             self.closeProgressDialog()
             if action == -1:
                 self._openAfterImport(data)
             elif action == -2:
                 dlg = wx.MessageDialog(self,
-                                       "The following error was generated\n\n%s\n\nBe aware that already processed fits were not saved" % data,
+                                       "The following error was generated\n\n%s\n\nNo fits were imported" % data,
                                        "Import Error", wx.OK | wx.ICON_ERROR)
                 if dlg.ShowModal() == wx.ID_OK:
                     return
@@ -43,6 +43,7 @@ class MainMenuBar(wx.MenuBar):
         self.implantSetEditorId = wx.NewId()
         self.graphFrameId = wx.NewId()
         self.backupFitsId = wx.NewId()
+        self.valueFitsId = wx.NewId()
         self.exportSkillsNeededId = wx.NewId()
         self.importCharacterId = wx.NewId()
         self.exportHtmlId = wx.NewId()
@@ -78,6 +79,8 @@ class MainMenuBar(wx.MenuBar):
         fileMenu.Append(wx.ID_SAVEAS, "&Export Fitting\tCTRL+S", "Export fitting to another format")
         fileMenu.AppendSeparator()
         fileMenu.Append(self.exportHtmlId, "Export HTML", "Export fits to HTML file (set in Preferences)")
+        fileMenu.Append(self.valueFitsId, "&Value Open Fittings",
+                        "Copy combined multibuy of all open fittings to the clipboard and show their values")
         fileMenu.Append(self.exportSkillsNeededId, "Export &Skills Needed", "Export skills needed for this fitting")
         fileMenu.Append(self.importCharacterId, "Import C&haracter File", "Import characters into pyfa from file")
         fileMenu.AppendSeparator()
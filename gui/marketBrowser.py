@@ -21,7 +21,9 @@
 import wx
 from service.market import Market
 from service.attribute import Attribute
+from service.fit import Fit
 from gui.display import Display
+import gui.globalEvents as GE
 import gui.PFSearchBox as SBox
 from gui.cachingImageList import CachingImageList
 from gui.contextMenu import ContextMenu
@@ -35,6 +37,10 @@ ItemSelected, ITEM_SELECTED = wx.lib.newevent.NewEvent()
 RECENTLY_USED_MODULES = -2
 MAX_RECENTLY_USED_MODULES = 20
 
+# Ways to show items which can't be fit to ship of active fit
+FIT_FILTER_OFF, FIT_FILTER_GREY, FIT_FILTER_HIDE = range(3)
+FIT_FILTER_LABELS = ("Show all items", "Grey out unfittable items", "Hide unfittable items")
+
 
 class MetaButton(wx.ToggleButton):
     def __init__(self, *args, **kwargs):
@@ -100,6 +106,17 @@ class MarketBrowser(wx.Panel):
 
         p.SetMinSize((wx.SIZE_AUTO_WIDTH, btn.GetSize()[1] + 5))
 
+        # Filter for items which can't be fit to active ship
+        self.sFit = Fit.getInstance()
+        self.fitFilter = wx.Choice(self, wx.ID_ANY, choices=FIT_FILTER_LABELS)
+        self.fitFilter.SetSelection(self.sFit.serviceFittingOptions["marketFitFilter"] or FIT_FILTER_OFF)
+        vbox.Add(self.fitFilter, 0, wx.EXPAND)
+        self.fitFilter.Bind(wx.EVT_CHOICE, self.changeFitFilter)
+
+    def changeFitFilter(self, event):
+        self.sFit.serviceFittingOptions["marketFitFilter"] = self.fitFilter.GetSelection()
+        self.itemView.filterItemStore()
+
     def toggleMetaButton(self, event):
         """Process clicks on toggle buttons"""
         appendMeta = wx.GetMouseState().CmdDown()
@@ -238,6 +255,9 @@ class ItemView(Display):
 
         self.unfilteredStore = set()
         self.filteredStore = set()
+        # IDs of listed items which can't be fit to active ship
+        self.unfittableIDs = set()
+        self.activeShipID = None
         self.recentlyUsedModules = set()
         self.sMkt = marketBrowser.sMkt
         self.searchMode = marketBrowser.searchMode
@@ -255,6 +275,7 @@ class ItemView(Display):
         self.Bind(wx.EVT_CONTEXT_MENU, self.contextMenu)
         self.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self.itemActivated)
         self.Bind(wx.EVT_LIST_BEGIN_DRAG, self.startDrag)
+        self.mainFrame.Bind(GE.FIT_CHANGED, self.fitChanged)
 
         # Make reverse map, used by sorter
         self.metaMap = self.makeReverseMetaMap()
@@ -337,6 +358,22 @@ class ItemView(Display):
     def updateItemStore(self, items):
         self.unfilteredStore = items
 
+    def fitChanged(self, event):
+        event.Skip()
+        fit = Fit.getInstance().getFit(self.mainFrame.getActiveFit(), basic=True)
+        shipID = fit.ship.item.ID if fit is not None and fit.ship is not None else None
+        if shipID != self.activeShipID:
+            self.activeShipID = shipID
+            if self.marketBrowser.fitFilter.GetSelection() != FIT_FILTER_OFF:
+                self.filterItemStore()
+
+    def getUnfittableIDs(self, items):
+        """Get IDs of items which can't be fit to active ship"""
+        if self.activeShipID is None:
+            return set()
+        index = self.sMkt.getCompatibilityIndex()
+        return set(item.ID for item in items if not index.isFittable(self.activeShipID, item.ID))
+
     def filterItemStore(self):
         sMkt = self.sMkt
         selectedMetas = set()
@@ -344,6 +381,13 @@ class ItemView(Display):
             if btn.GetValue():
                 selectedMetas.update(sMkt.META_MAP[btn.metaName])
         self.filteredStore = sMkt.filterItemsByMeta(self.unfilteredStore, selectedMetas)
+        fitFilter = self.marketBrowser.fitFilter.GetSelection()
+        if fitFilter == FIT_FILTER_OFF:
+            self.unfittableIDs = set()
+        else:
+            self.unfittableIDs = self.getUnfittableIDs(self.filteredStore)
+            if fitFilter == FIT_FILTER_HIDE:
+                self.filteredStore = set(item for item in self.filteredStore if item.ID not in self.unfittableIDs)
         self.update(list(self.filteredStore))
 
     def setToggles(self):
@@ -430,7 +474,7 @@ class ItemView(Display):
         if len(items) > 0:
             # Get dictionary with meta level attribute
             sAttr = Attribute.getInstance()
-            attrs = sAttr.getAttributeInfo("metaLevel")
+            attrs = sAttr.getAttributeMeta("metaLevel")
             sMkt = self.sMkt
             self.metalvls = sMkt.directAttrRequest(items, attrs)
             # Clear selection
@@ -446,7 +490,7 @@ class ItemView(Display):
         if len(items) > 1:
             # Get dictionary with meta level attribute
             sAttr = Attribute.getInstance()
-            attrs = sAttr.getAttributeInfo("metaLevel")
+            attrs = sAttr.getAttributeMeta("metaLevel")
             sMkt = self.sMkt
             self.metalvls = sMkt.directAttrRequest(items, attrs)
             # Re-sort stuff
@@ -458,6 +502,12 @@ class ItemView(Display):
 
         Display.refresh(self, items)
 
+        for i, item in enumerate(items):
+            if item.ID in self.unfittableIDs:
+                self.SetItemTextColour(i, wx.SystemSettings.GetColour(wx.SYS_COLOUR_GRAYTEXT))
+            else:
+                self.SetItemTextColour(i, self.GetTextColour())
+
     def makeReverseMetaMap(self):
         """
         Form map which tells in which tab items of given metagroup are located
@@ -13,7 +13,7 @@ except:
     else:
         raise
 
-from eos.db.gamedata.queries import getItem, getAttributeInfo
+from eos.db.gamedata.queries import getItem, getAttributeMeta
 from service.market import Market
 import gui.display as d
 import gui.globalEvents as GE
@@ -107,7 +107,7 @@ class AttributeEditor(wx.Frame):
                 for row in spamreader:
                     itemID, attrID, value = row
                     item = getItem(int(itemID))
-                    attr = getAttributeInfo(int(attrID))
+                    attr = getAttributeMeta(int(attrID))
                     item.setOverride(attr, float(value))
             self.itemView.updateItems(True)
 
@@ -0,0 +1,93 @@
+#!/usr/bin/env python2.7
+# ===============================================================================
+# Copyright (C) 2010 Diego Duclos
+#
+# This file is part of eos.
+#
+# eos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# eos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with eos.  If not, see <http://www.gnu.org/licenses/>.
+# ===============================================================================
+
+"""
+Stress benchmark for saveddata query cache invalidation.
+
+Simulates a large saved fit library: every fit is cached by ID lookups,
+and a share of them is also cached as part of list queries. Then fits are
+deleted one by one (which is what happens on fit delete / save) and the time
+spent in removeCachedEntry is reported.
+"""
+
+import argparse
+import os.path
+import random
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.realpath(os.path.join(script_dir, "..")))
+
+import eos.config  # noqa: E402
+
+# We do not need any real data, keep everything in memory
+eos.config.saveddataCache = True
+eos.config.gamedata_connectionstring = "sqlite:///:memory:"
+eos.config.saveddata_connectionstring = "sqlite:///:memory:"
+
+from eos.db.saveddata.queries import cachedQuery, removeCachedEntry  # noqa: E402
+
+
+class FakeFit(object):
+    def __init__(self, ID):
+        self.ID = ID
+
+
+def main(fits, lists, listSize, deletions):
+    library = dict((ID, FakeFit(ID)) for ID in xrange(fits))
+
+    @cachedQuery(FakeFit, 1, "lookfor")
+    def getFakeFit(lookfor):
+        return library.get(lookfor)
+
+    @cachedQuery(FakeFit, 1, "lookfor")
+    def getFakeFitList(lookfor):
+        rnd = random.Random(lookfor)
+        return [library[ID] for ID in rnd.sample(library.keys(), min(listSize, len(library)))]
+
+    start = time.time()
+    for ID in library:
+        getFakeFit(ID)
+    for listID in xrange(lists):
+        getFakeFitList(listID)
+    fill = time.time() - start
+
+    toDelete = random.Random(0).sample(library.keys(), min(deletions, len(library)))
+    start = time.time()
+    for ID in toDelete:
+        removeCachedEntry(FakeFit, ID)
+    invalidation = time.time() - start
+
+    print("Fits: {0}, list queries: {1} x {2} fits".format(fits, lists, listSize))
+    print("Cache fill: {0:.2f}ms".format(fill * 1000))
+    print("Invalidation of {0} fits: {1:.2f}ms ({2:.4f}ms per fit)".format(
+            len(toDelete), invalidation * 1000, invalidation * 1000 / max(len(toDelete), 1)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark saveddata query cache invalidation")
+    parser.add_argument("-f", "--fits", type=int, default=20000, help="amount of fits in simulated library")
+    parser.add_argument("-l", "--lists", type=int, default=500, help="amount of cached list queries")
+    parser.add_argument("-s", "--listsize", type=int, default=50, help="amount of fits per list query")
+    parser.add_argument("-d", "--deletions", type=int, default=2000, help="amount of fits to invalidate")
+    args = parser.parse_args()
+
+    main(args.fits, args.lists, args.listsize, args.deletions)
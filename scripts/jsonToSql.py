@@ -28,8 +28,9 @@ sys.path.append(os.path.realpath(os.path.join(path, "..")))
 
 import json
 import argparse
+import time
 
-def main(db, json_path):
+def main(db, json_path, bulk=False):
 
     jsonPath = os.path.expanduser(json_path)
 
@@ -42,8 +43,9 @@ def main(db, json_path):
     import eos.db
     import eos.gamedata
 
-    # Create the database tables
-    eos.db.gamedata_meta.create_all()
+    if not bulk:
+        # Create the database tables
+        eos.db.gamedata_meta.create_all()
 
     # Config dict
     tables = {
@@ -168,10 +170,7 @@ def main(db, json_path):
             row['factionID'] = factionMap.get(int(row['typeID']))
         return typesData
 
-    data = {}
-
-    # Dump all data to memory so we can easely cross check ignored rows
-    for jsonName, cls in tables.iteritems():
+    def loadTable(jsonName):
         with open(os.path.join(jsonPath, "{}.json".format(jsonName))) as f:
             tableData = json.load(f)
         if jsonName in rowsInValues:
@@ -184,20 +183,22 @@ def main(db, json_path):
             tableData = convertTypes(tableData)
         if jsonName == "clonegrades":
             tableData = convertClones(tableData)
-        data[jsonName] = tableData
-
-    # Set with typeIDs which we will have in our database
-    # Sometimes CCP unpublishes some items we want to have published, we
-    # can do it here - just add them to initial set
-    eveTypes = set()
-    for row in data["evetypes"]:
-        # 1306 - group Ship Modifiers, for items like tactical t3 ship modes
-        # (3638, 3634, 3636, 3640) - Civilian weapons
-        # (41549, 41548, 41551, 41550) - Micro Bombs (Fighters)
-        if (row["published"] or row['groupID'] == 1306
-            or row['typeID'] in (3638, 3634, 3636, 3640)
-            or row['typeID'] in (41549, 41548, 41551,41550)):
-            eveTypes.add(row["typeID"])
+        return tableData
+
+    def getEveTypes(typesData):
+        # Set with typeIDs which we will have in our database
+        # Sometimes CCP unpublishes some items we want to have published, we
+        # can do it here - just add them to initial set
+        eveTypes = set()
+        for row in typesData:
+            # 1306 - group Ship Modifiers, for items like tactical t3 ship modes
+            # (3638, 3634, 3636, 3640) - Civilian weapons
+            # (41549, 41548, 41551, 41550) - Micro Bombs (Fighters)
+            if (row["published"] or row['groupID'] == 1306
+                or row['typeID'] in (3638, 3634, 3636, 3640)
+                or row['typeID'] in (41549, 41548, 41551,41550)):
+                eveTypes.add(row["typeID"])
+        return eveTypes
 
     # ignore checker
     def isIgnored(file, row):
@@ -205,6 +206,34 @@ def main(db, json_path):
             return True
         return False
 
+    def fixRow(jsonName, row):
+        # fix for issue 80
+        if jsonName == "icons" and "res:/ui/texture/icons/" in str(row["iconFile"]).lower():
+            row["iconFile"] = row["iconFile"].lower().replace("res:/ui/texture/icons/", "").replace(".png", "")
+            # with res:/ui... references, it points to the actual icon file (including it's size variation of #_size_#)
+            # strip this info out and get the identifying info
+            split = row['iconFile'].split('_')
+            if len(split) == 3:
+                row['iconFile'] = "{}_{}".format(split[0], split[2])
+        if jsonName == "icons" and "modules/" in str(row["iconFile"]).lower():
+            row["iconFile"] = row["iconFile"].lower().replace("modules/", "").replace(".png", "")
+
+    if bulk:
+        # Types go first, they tell which rows of other dumps are ignored
+        typesData = loadTable("evetypes")
+        eveTypes = getEveTypes(typesData)
+        bulkLoad(eos.db, tables, fieldMapping, typesData, loadTable, isIgnored, fixRow)
+        print("done")
+        return
+
+    data = {}
+
+    # Dump all data to memory so we can easely cross check ignored rows
+    for jsonName, cls in tables.iteritems():
+        data[jsonName] = loadTable(jsonName)
+
+    eveTypes = getEveTypes(data["evetypes"])
+
     # Loop through each json file and write it away, checking ignored rows
     for jsonName, table in data.iteritems():
         fieldMap = fieldMapping.get(jsonName, {})
@@ -216,16 +245,7 @@ def main(db, json_path):
             # We don't care about some kind of rows, filter it out if so
             if not isIgnored(jsonName, row):
                 instance = tables[jsonName]()
-                # fix for issue 80
-                if jsonName is "icons" and "res:/ui/texture/icons/" in str(row["iconFile"]).lower():
-                    row["iconFile"] = row["iconFile"].lower().replace("res:/ui/texture/icons/", "").replace(".png", "")
-                    # with res:/ui... references, it points to the actual icon file (including it's size variation of #_size_#)
-                    # strip this info out and get the identifying info
-                    split = row['iconFile'].split('_')
-                    if len(split) == 3:
-                        row['iconFile'] = "{}_{}".format(split[0], split[2])
-                if jsonName is "icons" and "modules/" in str(row["iconFile"]).lower():
-                    row["iconFile"] = row["iconFile"].lower().replace("modules/", "").replace(".png", "")
+                fixRow(jsonName, row)
 
                 if jsonName is "clonegrades":
                     if (row["alphaCloneID"] not in tmp):
@@ -246,10 +266,86 @@ def main(db, json_path):
 
     print("done")
 
+
+def bulkLoad(db, tables, fieldMapping, typesData, loadTable, isIgnored, fixRow):
+    """
+    Write all tables with executemany inserts in single transaction. Dumps are
+    loaded one at a time, and indexes are created after all rows are in place.
+    Produces the same schema and rows as the ORM path.
+    """
+    from sqlalchemy.orm import class_mapper
+    from sqlalchemy.schema import CreateTable
+    from eos.db.gamedata.alphaClones import alphaclones_table
+
+    conn = db.gamedata_engine.connect()
+    # These are not persisted in database file
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    trans = conn.begin()
+
+    created = []
+    for table in db.gamedata_meta.sorted_tables:
+        if not db.gamedata_engine.dialect.has_table(conn, table.name):
+            conn.execute(CreateTable(table))
+            created.append(table)
+
+    def insertRows(jsonName, tableData):
+        mapper = class_mapper(tables[jsonName])
+        table = mapper.local_table
+        # Attribute name: column name, the same way ORM path sets attributes on instances
+        columns = dict((prop.key, prop.columns[0].key) for prop in mapper.column_attrs)
+        for prop in mapper.synonyms:
+            if prop.name in columns:
+                columns[prop.key] = columns[prop.name]
+        fieldMap = fieldMapping.get(jsonName, {})
+        clones = []
+        cloneIDs = set()
+        rows = []
+        for row in tableData:
+            if isIgnored(jsonName, row):
+                continue
+            fixRow(jsonName, row)
+            if jsonName == "clonegrades" and row["alphaCloneID"] not in cloneIDs:
+                cloneIDs.add(row["alphaCloneID"])
+                clones.append({"alphaCloneID": row["alphaCloneID"], "alphaCloneName": row["alphaCloneName"]})
+            values = dict((column.key, None) for column in table.columns)
+            for k, v in row.iteritems():
+                if isinstance(v, basestring):
+                    v = v.strip()
+                column = columns.get(fieldMap.get(k, k))
+                if column is not None:
+                    values[column] = v
+            rows.append(values)
+        if clones:
+            conn.execute(alphaclones_table.insert(), clones)
+        if rows:
+            conn.execute(table.insert(), rows)
+        return len(clones) + len(rows)
+
+    for jsonName in ["evetypes"] + sorted(name for name in tables if name != "evetypes"):
+        tableData = typesData if jsonName == "evetypes" else loadTable(jsonName)
+        typesData = None
+        start = time.time()
+        rowCount = insertRows(jsonName, tableData)
+        elapsed = time.time() - start
+        print("{0}: {1} rows in {2:.2f}s ({3:.0f} rows/s)".format(
+                jsonName, rowCount, elapsed, rowCount / elapsed if elapsed else 0))
+
+    start = time.time()
+    for table in created:
+        for index in table.indexes:
+            index.create(conn)
+    print("indexes: {0:.2f}s".format(time.time() - start))
+
+    trans.commit()
+    conn.close()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="This scripts dumps effects from an sqlite cache dump to mongo")
     parser.add_argument("-d", "--db", required=True, type=str, help="The sqlalchemy connectionstring, example: sqlite:///c:/tq.db")
     parser.add_argument("-j", "--json", required=True, type=str, help="The path to the json dump")
+    parser.add_argument("-b", "--bulk", action="store_true", help="Use bulk loader: single transaction, executemany inserts, deferred indexes")
     args = parser.parse_args()
 
-    main(args.db, args.json)
+    main(args.db, args.json, args.bulk)
@@ -0,0 +1,151 @@
+# =============================================================================
+# Copyright (C) 2010 Diego Duclos
+#
+# This file is part of pyfa.
+#
+# pyfa is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyfa is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyfa.  If not, see <http://www.gnu.org/licenses/>.
+# =============================================================================
+
+import hashlib
+import os
+import threading
+import time
+
+from logbook import Logger
+
+import config
+
+pyfalog = Logger(__name__)
+
+# Total size of cached documents, in bytes
+MAX_CACHE_SIZE = 4 * 1024 * 1024
+
+
+class ApiCacheHandler(object):
+    """
+    On-disk cache handler for eveapi (see EVEAPIConnection). Documents are
+    kept until cachedUntil time the API reported for them, one file per
+    request. File names are hashes of host, path and parameters, so API keys
+    don't end up in them. When cache grows over maxSize, documents which
+    expire first are dropped.
+    """
+
+    instance = None
+
+    @classmethod
+    def getInstance(cls):
+        if cls.instance is None:
+            cls.instance = ApiCacheHandler(os.path.join(config.savePath, "apicache"))
+
+        return cls.instance
+
+    def __init__(self, path, maxSize=MAX_CACHE_SIZE):
+        self.path = path
+        self.maxSize = maxSize
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def getKey(host, path, params):
+        key = u"\n".join([host, path] + [u"{0}={1}".format(name, params[name]) for name in sorted(params)])
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def getFilePath(self, key):
+        return os.path.join(self.path, key + ".xml")
+
+    def retrieve(self, host, path, params):
+        filePath = self.getFilePath(self.getKey(host, path, params))
+        with self.__lock:
+            try:
+                with open(filePath, "rb") as f:
+                    expiry = float(f.readline())
+                    if expiry > time.time():
+                        pyfalog.debug("Using cached API document for {0}", path)
+                        return f.read()
+            except (IOError, ValueError):
+                return None
+            # Document is stale
+            self.__remove(filePath)
+        return None
+
+    def store(self, host, path, params, doc, obj):
+        # Server and local clocks may differ, so only cache lifetime is taken from server
+        lifetime = getattr(obj, "cachedUntil", 0) - getattr(obj, "currentTime", 0)
+        if lifetime <= 0:
+            return
+        filePath = self.getFilePath(self.getKey(host, path, params))
+        with self.__lock:
+            try:
+                if not os.path.isdir(self.path):
+                    os.makedirs(self.path)
+                # Write to temporary file first, so that half-written documents are never read
+                tmpPath = filePath + ".tmp"
+                with open(tmpPath, "wb") as f:
+                    f.write("{0}\n".format(time.time() + lifetime))
+                    f.write(doc)
+                if os.path.exists(filePath):
+                    os.remove(filePath)
+                os.rename(tmpPath, filePath)
+            except (IOError, OSError) as e:
+                pyfalog.warning("Failed to cache API document for {0}: {1}", path, e)
+                return
+            self.__prune()
+
+    def clear(self):
+        with self.__lock:
+            for name, _, _ in self.__entries():
+                self.__remove(os.path.join(self.path, name))
+
+    def __entries(self):
+        """Get (file name, expiry time, size) of all cached documents"""
+        entries = []
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(".xml"):
+                continue
+            filePath = os.path.join(self.path, name)
+            try:
+                with open(filePath, "rb") as f:
+                    expiry = float(f.readline())
+                entries.append((name, expiry, os.path.getsize(filePath)))
+            except (IOError, OSError, ValueError):
+                # Broken file, get rid of it
+                entries.append((name, 0, 0))
+        return entries
+
+    def __prune(self):
+        entries = self.__entries()
+        now = time.time()
+        size = 0
+        keep = []
+        for name, expiry, fileSize in entries:
+            if expiry <= now:
+                self.__remove(os.path.join(self.path, name))
+            else:
+                keep.append((expiry, name, fileSize))
+                size += fileSize
+        keep.sort()
+        while size > self.maxSize and keep:
+            _, name, fileSize = keep.pop(0)
+            self.__remove(os.path.join(self.path, name))
+            size -= fileSize
+
+    @staticmethod
+    def __remove(filePath):
+        try:
+            os.remove(filePath)
+        except OSError:
+            pass
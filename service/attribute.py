@@ -32,6 +32,7 @@ class Attribute(object):
 
     @staticmethod
     def getAttributeInfo(identity):
+        """Get full attribute record with description, icon and unit objects, it's queried from database"""
         if isinstance(identity, (int, basestring)):
             info = eos.db.getAttributeInfo(identity, eager=("icon", "unit"))
         elif isinstance(identity, (int, float)):
@@ -40,3 +41,12 @@ class Attribute(object):
         else:
             info = None
         return info
+
+    @staticmethod
+    def getAttributeMeta(identity):
+        """Get compact, preloaded metadata (name, default value, cap, unit...) of attribute by its ID or name"""
+        if isinstance(identity, float):
+            identity = int(identity)
+        if isinstance(identity, (int, basestring)):
+            return eos.db.getAttributeMeta(identity)
+        return None
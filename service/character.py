@@ -33,6 +33,7 @@ import wx
 import config
 import eos.db
 from service.eveapi import EVEAPIConnection, ParseXML
+from service.apiCache import ApiCacheHandler
 
 from eos.saveddata.implant import Implant as es_Implant
 from eos.saveddata.character import Character as es_Character
@@ -342,7 +343,7 @@ class Character(object):
         char.apiID = userID
         char.apiKey = apiKey
 
-        api = EVEAPIConnection()
+        api = EVEAPIConnection(cacheHandler=ApiCacheHandler.getInstance())
         auth = api.auth(keyID=userID, vCode=apiKey)
         apiResult = auth.account.Characters()
         charList = map(lambda c: unicode(c.name), apiResult.characters)
@@ -355,7 +356,7 @@ class Character(object):
         dbChar = eos.db.getCharacter(charID)
         dbChar.defaultChar = charName
 
-        api = EVEAPIConnection()
+        api = EVEAPIConnection(cacheHandler=ApiCacheHandler.getInstance())
         auth = api.auth(keyID=dbChar.apiID, vCode=dbChar.apiKey)
         apiResult = auth.account.Characters()
         charID = None
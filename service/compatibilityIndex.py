@@ -0,0 +1,187 @@
+# =============================================================================
+# Copyright (C) 2010 Diego Duclos
+#
+# This file is part of pyfa.
+#
+# pyfa is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyfa is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyfa.  If not, see <http://www.gnu.org/licenses/>.
+# =============================================================================
+
+import threading
+from collections import namedtuple
+
+from logbook import Logger
+
+import eos.config
+import eos.db
+from utils.timer import Timer
+
+pyfalog = Logger(__name__)
+
+# Module, Subsystem, Structure Module
+MODULE_CATEGORIES = (7, 32, 66)
+# Ship, Structure
+SHIP_CATEGORIES = (6, 65)
+STRUCTURE_CATEGORY = 65
+
+# Slot effect name: ship attribute with amount of such slots, same as
+# Module slot calculation and Fit.slots
+SLOT_EFFECTS = {
+    "hiPower"    : "hiSlots",
+    "medPower"   : "medSlots",
+    "loPower"    : "lowSlots",
+    "rigSlot"    : "rigSlots",
+    "subSystem"  : "maxSubSystems",
+    "serviceSlot": "serviceSlots",
+}
+# Slots which strategic cruisers get from their subsystems
+SUBSYSTEM_GRANTED_SLOTS = ("hiSlots", "medSlots", "lowSlots")
+
+SHIP_ATTRIBUTES = ("isCapitalSize", "rigSize") + tuple(SLOT_EFFECTS.itervalues())
+MODULE_ATTRIBUTES = ("fitsToShipType", "rigSize")
+MODULE_ATTRIBUTE_PREFIXES = ("canFitShipType", "canFitShipGroup")
+
+ShipRecord = namedtuple("ShipRecord", ("typeID", "groupID", "isStructure", "isCapital", "rigSize", "slots"))
+ModuleRecord = namedtuple("ModuleRecord", ("typeID", "slot", "shipTypes", "shipGroups", "isCapital", "rigSize"))
+
+
+class ShipCompatibilityIndex(object):
+    """
+    Tells which modules can be fit to which ship, judging by static data only:
+    slot presence, ship type and group restrictions, capital size, rig size and
+    structure-only modules. Checks which depend on fit contents (free slots,
+    hardpoints, max group fitted) are left to Module.fits.
+
+    Module and ship data is read for current gamedata with a few queries, sets
+    of fittable modules are formed per ship type on first request.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.__lock = threading.Lock()
+        # typeID: ShipRecord
+        self.__ships = {}
+        # typeID: ModuleRecord
+        self.__modules = {}
+        # Ship typeID: frozenset(module typeIDs)
+        self.__fittable = {}
+
+    @property
+    def built(self):
+        return self.version is not None and self.version == eos.config.gamedata_version
+
+    def build(self):
+        """Load restriction data of all ships and modules for current gamedata"""
+        with self.__lock:
+            if self.built:
+                return
+            with Timer("Build ship compatibility index", pyfalog) as timer:
+                groups = {}
+                categories = {}
+                for typeID, _, _, groupID, _, categoryID, _ in eos.db.getItemSearchData():
+                    if categoryID in SHIP_CATEGORIES or categoryID in MODULE_CATEGORIES:
+                        groups[typeID] = groupID
+                        categories[typeID] = categoryID
+
+                shipAttrs = {}
+                for typeID, name, value in eos.db.getCategoryAttributeValues(SHIP_CATEGORIES, SHIP_ATTRIBUTES):
+                    shipAttrs.setdefault(typeID, {})[name] = value
+                modAttrs = {}
+                for typeID, name, value in eos.db.getCategoryAttributeValues(
+                        MODULE_CATEGORIES, MODULE_ATTRIBUTES, MODULE_ATTRIBUTE_PREFIXES):
+                    modAttrs.setdefault(typeID, {})[name] = value
+                # Volume is stored with item itself, it's moved to attributes on item load
+                modVolumes = dict(eos.db.getCategoryVolumes(MODULE_CATEGORIES))
+                modSlots = {}
+                for typeID, effectName in eos.db.getCategoryEffectNames(MODULE_CATEGORIES, SLOT_EFFECTS.keys()):
+                    modSlots[typeID] = SLOT_EFFECTS[effectName]
+                timer.checkpoint("queries")
+
+                ships = {}
+                modules = {}
+                for typeID, categoryID in categories.iteritems():
+                    if categoryID in SHIP_CATEGORIES:
+                        attrs = shipAttrs.get(typeID, {})
+                        slots = dict((attr, attrs.get(attr) or 0) for attr in SLOT_EFFECTS.itervalues())
+                        ships[typeID] = ShipRecord(typeID, groups[typeID], categoryID == STRUCTURE_CATEGORY,
+                                                   attrs.get("isCapitalSize", 0) == 1, attrs.get("rigSize"), slots)
+                    else:
+                        attrs = modAttrs.get(typeID, {})
+                        shipTypes = set()
+                        shipGroups = set()
+                        for name, value in attrs.iteritems():
+                            if value is None:
+                                continue
+                            if name == "fitsToShipType" or name.startswith("canFitShipType"):
+                                shipTypes.add(int(value))
+                            elif name.startswith("canFitShipGroup"):
+                                shipGroups.add(int(value))
+                        modules[typeID] = ModuleRecord(typeID, modSlots.get(typeID), frozenset(shipTypes),
+                                                       frozenset(shipGroups), (modVolumes.get(typeID) or 0) >= 4000,
+                                                       attrs.get("rigSize"))
+
+                self.__ships = ships
+                self.__modules = modules
+                self.__fittable = {}
+                self.version = eos.config.gamedata_version
+            pyfalog.debug("Ship compatibility index: {0} ships, {1} modules", len(ships), len(modules))
+
+    @staticmethod
+    def compatible(ship, module):
+        """Check if module record can be fit to ship record"""
+        if module.slot is not None:
+            # Strategic cruisers get most of their slots from subsystems
+            if ship.slots[module.slot] <= 0 and not (
+                    module.slot in SUBSYSTEM_GRANTED_SLOTS and ship.slots["maxSubSystems"] > 0):
+                return False
+
+        if module.shipTypes or module.shipGroups:
+            if ship.typeID not in module.shipTypes and ship.groupID not in module.shipGroups:
+                return False
+        # Structures take only modules which are explicitly restricted to them
+        elif ship.isStructure:
+            return False
+
+        if module.isCapital and not ship.isCapital:
+            return False
+
+        if module.slot == "rigSlots" and module.rigSize != ship.rigSize:
+            return False
+
+        return True
+
+    def getFittableItems(self, shipTypeID):
+        """Get frozenset of typeIDs of modules which can be fit to given ship type"""
+        if not self.built:
+            self.build()
+        fittable = self.__fittable.get(shipTypeID)
+        if fittable is None:
+            ship = self.__ships.get(shipTypeID)
+            if ship is None:
+                fittable = frozenset()
+            else:
+                fittable = frozenset(typeID for typeID, module in self.__modules.iteritems()
+                                     if self.compatible(ship, module))
+            self.__fittable[shipTypeID] = fittable
+        return fittable
+
+    def isFittable(self, shipTypeID, typeID):
+        """
+        Check if item can be fit to given ship type. Items which are not modules
+        (drones, charges, implants...) are not restricted by this index.
+        """
+        if not self.built:
+            self.build()
+        if typeID not in self.__modules:
+            return True
+        return typeID in self.getFittableItems(shipTypeID)
@@ -55,7 +55,13 @@ class Fit(object):
         self.targetResists = None
         self.character = saveddata_Character.getAll5()
         self.booster = False
+        # IDs of fits with changes which aren't calculated yet, and function
+        # which schedules their calculation
         self.dirtyFitIDs = set()
+        self.recalcScheduler = None
+        # fitID: modules user changed, states of other modules are checked
+        # once deferred calculation is done
+        self.stateChecks = {}
 
         serviceFittingDefaultOptions = {
             "useGlobalCharacter": False,
@@ -68,10 +74,12 @@ class Fit(object):
             "compactSkills": True,
             "showTooltip": True,
             "showMarketShortcuts": False,
+            "marketFitFilter": 0,
             "enableGaugeAnimation": True,
             "exportCharges": True,
             "openFitInNew": False,
             "priceSystem": "Jita",
+            "priceFile": "",
         }
 
         self.serviceFittingOptions = SettingsProvider.getInstance().getSettings(
@@ -82,6 +90,14 @@ class Fit(object):
         fits = eos.db.getFitList()
         return fits
 
+    @staticmethod
+    def iterAllFits():
+        """Load fits one at a time, only fit being processed is kept in memory"""
+        for fitID in eos.db.getFitIDs():
+            fit = eos.db.getFit(fitID)
+            if fit is not None:
+                yield fit
+
     @staticmethod
     def getFitsWithShip(shipID):
         """ Lists fits of shipID, used with shipBrowser """
@@ -177,7 +193,7 @@ class Fit(object):
 
         fit = eos.db.getFit(fitID)
         fit.factorReload = not fit.factorReload
-        eos.db.commit()
+        eos.db.requestCommit()
         self.recalc(fit)
 
     def switchFit(self, fitID):
@@ -194,7 +210,7 @@ class Fit(object):
             if fit.damagePattern != self.pattern:
                 fit.damagePattern = self.pattern
 
-        eos.db.commit()
+        eos.db.requestCommit()
         self.recalc(fit, withBoosters=True)
 
     def getFit(self, fitID, projected=False, basic=False):
@@ -211,6 +227,9 @@ class Fit(object):
         if basic:
             return fit
 
+        if fitID in self.dirtyFitIDs or fitID in self.stateChecks:
+            self.flushRecalcs(fitID)
+
         inited = getattr(fit, "inited", None)
 
         if inited is None or inited is False:
@@ -223,7 +242,7 @@ class Fit(object):
             # Check that the states of all modules are valid
             self.checkStates(fit, None)
 
-            eos.db.commit()
+            eos.db.requestCommit()
             fit.inited = True
         return fit
 
@@ -278,7 +297,7 @@ class Fit(object):
             return False
 
         fit.boosters.append(booster)
-        self.recalc(fit)
+        self.requestRecalc(fit)
         return True
 
     def removeBooster(self, fitID, position):
@@ -288,7 +307,7 @@ class Fit(object):
         fit = eos.db.getFit(fitID)
         booster = fit.boosters[position]
         fit.boosters.remove(booster)
-        self.recalc(fit)
+        self.requestRecalc(fit)
         return True
 
     def project(self, fitID, thing):
@@ -377,7 +396,7 @@ class Fit(object):
             if projectionInfo:
                 projectionInfo.active = not projectionInfo.active
 
-        eos.db.commit()
+        eos.db.requestCommit()
         self.recalc(fit)
 
     def toggleCommandFit(self, fitID, thing):
@@ -386,7 +405,7 @@ class Fit(object):
         if commandInfo:
             commandInfo.active = not commandInfo.active
 
-        eos.db.commit()
+        eos.db.requestCommit()
         self.recalc(fit)
 
     def changeAmount(self, fitID, projected_fit, amount):
@@ -397,14 +416,14 @@ class Fit(object):
         if projectionInfo:
             projectionInfo.amount = amount
 
-        eos.db.commit()
+        eos.db.requestCommit()
         self.recalc(fit)
 
     def changeActiveFighters(self, fitID, fighter, amount):
         fit = eos.db.getFit(fitID)
         fighter.amountActive = amount
 
-        eos.db.commit()
+        eos.db.requestCommit()
         self.recalc(fit)
 
     def removeProjected(self, fitID, thing):
@@ -448,13 +467,12 @@ class Fit(object):
             if m.isValidState(State.ACTIVE):
                 m.state = State.ACTIVE
 
-            # As some items may affect state-limiting attributes of the ship, calculate new attributes first
-            self.recalc(fit)
-            # Then, check states of all modules and change where needed. This will recalc if needed
-            self.checkStates(fit, m)
+            # As some items may affect state-limiting attributes of the ship, calculate new attributes first,
+            # then check states of all modules and change where needed
+            self.requestRecalc(fit, checkStates=True, base=m, now=m.item.category.name == "Subsystem")
 
             fit.fill()
-            eos.db.commit()
+            eos.db.requestCommit()
 
             return numSlots != len(fit.modules)
         else:
@@ -466,11 +484,11 @@ class Fit(object):
             return None
 
         numSlots = len(fit.modules)
+        subsystem = fit.modules[position].item.category.name == "Subsystem"
         fit.modules.toDummy(position)
-        self.recalc(fit)
-        self.checkStates(fit, None)
+        self.requestRecalc(fit, checkStates=True, now=subsystem)
         fit.fill()
-        eos.db.commit()
+        eos.db.requestCommit()
         return numSlots != len(fit.modules)
 
     def changeModule(self, fitID, position, newItemID):
@@ -492,13 +510,12 @@ class Fit(object):
             if m.isValidState(State.ACTIVE):
                 m.state = State.ACTIVE
 
-            # As some items may affect state-limiting attributes of the ship, calculate new attributes first
-            self.recalc(fit)
-            # Then, check states of all modules and change where needed. This will recalc if needed
-            self.checkStates(fit, m)
+            # As some items may affect state-limiting attributes of the ship, calculate new attributes first,
+            # then check states of all modules and change where needed
+            self.requestRecalc(fit, checkStates=True, base=m, now=m.item.category.name == "Subsystem")
 
             fit.fill()
-            eos.db.commit()
+            eos.db.requestCommit()
 
             return True
         else:
@@ -554,7 +571,7 @@ class Fit(object):
                 moduleP.amount = 1
                 fit.cargo.insert(cargoIdx, moduleP)
 
-        eos.db.commit()
+        eos.db.requestCommit()
         self.recalc(fit)
 
     @staticmethod
@@ -570,7 +587,7 @@ class Fit(object):
         fit.modules.remove(dstMod)
         fit.modules.insert(src, dstMod)
 
-        eos.db.commit()
+        eos.db.requestCommit()
 
     def cloneModule(self, fitID, src, dst):
         """
@@ -590,7 +607,7 @@ class Fit(object):
             fit.modules.remove(dstMod)
             fit.modules.insert(dst, new)
 
-            eos.db.commit()
+            eos.db.requestCommit()
             self.recalc(fit)
 
     def addCargo(self, fitID, itemID, amount=1, replace=False):
@@ -625,7 +642,7 @@ class Fit(object):
             cargo.amount += amount
 
         self.recalc(fit)
-        eos.db.commit()
+        eos.db.requestCommit()
 
         return True
 
@@ -679,7 +696,7 @@ class Fit(object):
                 else:
                     return False
 
-            eos.db.commit()
+            eos.db.requestCommit()
             self.recalc(fit)
             return True
         else:
@@ -690,7 +707,7 @@ class Fit(object):
         f = fit.fighters[i]
         fit.fighters.remove(f)
 
-        eos.db.commit()
+        eos.db.requestCommit()
         self.recalc(fit)
         return True
 
@@ -714,8 +731,8 @@ class Fit(object):
                 else:
                     return False
             drone.amount += numDronesToAdd
-            eos.db.commit()
-            self.recalc(fit)
+            eos.db.requestCommit()
+            self.requestRecalc(fit)
             return True
         else:
             return False
@@ -741,7 +758,7 @@ class Fit(object):
         if d2.amount > d2.amountActive:
             d2.amountActive = d2.amount
 
-        eos.db.commit()
+        eos.db.requestCommit()
         self.recalc(fit)
         return True
 
@@ -756,7 +773,7 @@ class Fit(object):
         newD.amount = total - amount
         newD.amountActive = newD.amount if active else 0
         l.append(newD)
-        eos.db.commit()
+        eos.db.requestCommit()
 
     def splitProjectedDroneStack(self, fitID, d, amount):
         if fitID is None:
@@ -782,7 +799,7 @@ class Fit(object):
         if d.amount == 0:
             del fit.drones[i]
 
-        eos.db.commit()
+        eos.db.requestCommit()
         self.recalc(fit)
         return True
 
@@ -794,8 +811,8 @@ class Fit(object):
         else:
             d.amountActive = d.amount
 
-        eos.db.commit()
-        self.recalc(fit)
+        eos.db.requestCommit()
+        self.requestRecalc(fit)
         return True
 
     def toggleFighter(self, fitID, i):
@@ -803,8 +820,8 @@ class Fit(object):
         f = fit.fighters[i]
         f.active = not f.active
 
-        eos.db.commit()
-        self.recalc(fit)
+        eos.db.requestCommit()
+        self.requestRecalc(fit)
         return True
 
     def toggleImplant(self, fitID, i):
@@ -812,16 +829,16 @@ class Fit(object):
         implant = fit.implants[i]
         implant.active = not implant.active
 
-        eos.db.commit()
-        self.recalc(fit)
+        eos.db.requestCommit()
+        self.requestRecalc(fit)
         return True
 
     def toggleImplantSource(self, fitID, source):
         fit = eos.db.getFit(fitID)
         fit.implantSource = source
 
-        eos.db.commit()
-        self.recalc(fit)
+        eos.db.requestCommit()
+        self.requestRecalc(fit)
         return True
 
     def toggleBooster(self, fitID, i):
@@ -829,15 +846,15 @@ class Fit(object):
         booster = fit.boosters[i]
         booster.active = not booster.active
 
-        eos.db.commit()
-        self.recalc(fit)
+        eos.db.requestCommit()
+        self.requestRecalc(fit)
         return True
 
     def toggleFighterAbility(self, fitID, ability):
         fit = eos.db.getFit(fitID)
         ability.active = not ability.active
-        eos.db.commit()
-        self.recalc(fit)
+        eos.db.requestCommit()
+        self.requestRecalc(fit)
 
     def changeChar(self, fitID, charID):
         if fitID is None or charID is None:
@@ -865,7 +882,7 @@ class Fit(object):
             if mod.isValidCharge(ammo):
                 mod.charge = ammo
 
-        self.recalc(fit)
+        self.requestRecalc(fit)
 
     @staticmethod
     def getTargetResists(fitID):
@@ -881,9 +898,9 @@ class Fit(object):
 
         fit = eos.db.getFit(fitID)
         fit.targetResists = pattern
-        eos.db.commit()
+        eos.db.requestCommit()
 
-        self.recalc(fit)
+        self.requestRecalc(fit)
 
     @staticmethod
     def getDamagePattern(fitID):
@@ -899,9 +916,9 @@ class Fit(object):
 
         fit = eos.db.getFit(fitID)
         fit.damagePattern = self.pattern = pattern
-        eos.db.commit()
+        eos.db.requestCommit()
 
-        self.recalc(fit)
+        self.requestRecalc(fit)
 
     def setMode(self, fitID, mode):
         if fitID is None:
@@ -909,9 +926,9 @@ class Fit(object):
 
         fit = eos.db.getFit(fitID)
         fit.mode = mode
-        eos.db.commit()
+        eos.db.requestCommit()
 
-        self.recalc(fit)
+        self.requestRecalc(fit)
 
     def setAsPattern(self, fitID, ammo):
         if fitID is None:
@@ -928,12 +945,14 @@ class Fit(object):
             setattr(dp, "%sAmount" % attr, ammo.getAttribute("%sDamage" % attr) or 0)
 
         fit.damagePattern = dp
-        self.recalc(fit)
+        self.requestRecalc(fit)
 
-    def checkStates(self, fit, base):
+    def checkStates(self, fit, base, *others):
+        """Switch modules to states they can have, except base and others which user has just changed"""
         changed = False
+        exempt = (base,) + others
         for mod in fit.modules:
-            if mod != base:
+            if mod not in exempt:
                 # fix for #529, where a module may be in incorrect state after CCP changes mechanics of module
                 if not mod.canHaveState(mod.state) or not mod.isValidState(mod.state):
                     mod.state = State.ONLINE
@@ -969,13 +988,12 @@ class Fit(object):
                         changed = True
 
         if changed:
-            eos.db.commit()
+            eos.db.requestCommit()
             fit = eos.db.getFit(fitID)
 
-            # As some items may affect state-limiting attributes of the ship, calculate new attributes first
-            self.recalc(fit)
-            # Then, check states of all modules and change where needed. This will recalc if needed
-            self.checkStates(fit, base)
+            # As some items may affect state-limiting attributes of the ship, calculate new attributes first,
+            # then check states of all modules and change where needed
+            self.requestRecalc(fit, checkStates=True, base=base)
 
     # Old state : New State
     localMap = {
@@ -1025,11 +1043,59 @@ class Fit(object):
             return None
 
         fit = eos.db.getFit(fitID)
-        eos.db.commit()
+        eos.db.requestCommit()
         self.recalc(fit)
 
+    def setRecalcScheduler(self, scheduler):
+        """
+        Scheduler is called with flushRecalcs when first fit gets change which
+        requests calculation, and has to call it some time later. Without
+        scheduler fits are calculated right away.
+        """
+        self.recalcScheduler = scheduler
+
+    def requestRecalc(self, fit, checkStates=False, base=None, now=False):
+        """
+        Calculate fit in deferred manner, changes made in quick succession
+        share one calculation. With checkStates, states of modules other than
+        base are checked after calculation. Now forces calculation right away,
+        for changes like subsystems which alter slot layout the caller needs.
+        """
+        scheduler = self.recalcScheduler
+        if now or scheduler is None or fit.ID is None:
+            self.recalc(fit)
+            if checkStates:
+                self.checkStates(fit, base)
+            return
+        schedule = not self.dirtyFitIDs and not self.stateChecks
+        self.dirtyFitIDs.add(fit.ID)
+        if checkStates:
+            self.stateChecks.setdefault(fit.ID, []).append(base)
+        if schedule:
+            scheduler(self.flushRecalcs)
+
+    def flushRecalcs(self, fitID=None):
+        """Calculate fits waiting for deferred calculation, or only given one of them"""
+        fitIDs = self.dirtyFitIDs | set(self.stateChecks) if fitID is None else {fitID}
+        for dirtyID in fitIDs:
+            bases = self.stateChecks.pop(dirtyID, None)
+            if dirtyID not in self.dirtyFitIDs and bases is None:
+                continue
+            fit = eos.db.getFit(dirtyID)
+            if fit is None:
+                self.dirtyFitIDs.discard(dirtyID)
+                continue
+            # Fit might have been calculated directly meanwhile, then only states are left to check
+            if dirtyID in self.dirtyFitIDs:
+                self.recalc(fit)
+            if bases is not None:
+                # This will recalc again if any state is changed
+                self.checkStates(fit, *bases)
+
     def recalc(self, fit, withBoosters=True):
         pyfalog.info("=" * 10 + "recalc" + "=" * 10)
+        # Any calculation takes pending deferred calculation with it
+        self.dirtyFitIDs.discard(fit.ID)
         if fit.factorReload is not self.serviceFittingOptions["useGlobalForceReload"]:
             fit.factorReload = self.serviceFittingOptions["useGlobalForceReload"]
         fit.clear()
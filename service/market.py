@@ -24,17 +24,23 @@ import Queue
 
 # noinspection PyPackageRequirements
 import wx
-from sqlalchemy.sql import or_
 
 import config
+import eos.config
 import eos.db
 from service import conversions
 from service.settings import SettingsProvider
+from service.fit import Fit
 from service.price import Price
+from service.searchIndex import ItemSearchIndex
+from service.nameIndex import ItemNameIndex
+from service.compatibilityIndex import ShipCompatibilityIndex
+from utils.timer import Timer
 
 from eos.gamedata import Category as types_Category, Group as types_Group, Item as types_Item, MarketGroup as types_MarketGroup, \
     MetaGroup as types_MetaGroup, MetaType as types_MetaType
 from eos.saveddata.price import Price as types_Price
+from eos.db.cache import QueryCache
 
 try:
     from collections import OrderedDict
@@ -46,16 +52,35 @@ pyfalog = Logger(__name__)
 # Event which tells threads dependent on Market that it's initialized
 mktRdy = threading.Event()
 
+# Fields of per-item market metadata records
+ITEMINFO_PUBLICITY, ITEMINFO_GROUP, ITEMINFO_METAGROUP, ITEMINFO_MARKETGROUP, ITEMINFO_PARENT = range(5)
+ITEMINFO_SIZE = 5
+# Marks record fields which were not requested yet
+ITEMINFO_MISSING = object()
+
+# Price objects kept in memory
+PRICE_CACHE_SIZE = 10000
+
+# Parts of implant and booster names which tell apart grades of the same implant
+IMPLANT_GRADE_MARKERS = re.compile(
+        "|".join(["(?:Low|Mid|High)-[Gg]rade ",
+                  "Limited ", "Copper ", "Gold ", "Silver ", "Advanced ", "Improved ", "Prototype ", "Standard ",
+                  "Strong ", "Synth ",
+                  " - (?:Advanced|Basic|Elite|Improved|Standard)",
+                  # Hardwiring codes, like -601 or -1012
+                  "-(?:6|7|8|9|10)[0-4][0-9]"]))
+
 
 class ShipBrowserWorkerThread(threading.Thread):
     def __init__(self):
         threading.Thread.__init__(self)
         pyfalog.debug("Initialize ShipBrowserWorkerThread.")
         self.name = "ShipBrowser"
-
-    def run(self):
+        # Requests can be queued before thread gets to run
         self.queue = Queue.Queue()
         self.cache = {}
+
+    def run(self):
         # Wait for full market initialization (otherwise there's high risky
         # this thread will attempt to init Market which is already being inited)
         mktRdy.wait(5)
@@ -68,12 +93,12 @@ class ShipBrowserWorkerThread(threading.Thread):
         while True:
             try:
                 id_, callback = queue.get()
-                set_ = cache.get(id_)
-                if set_ is None:
-                    set_ = sMkt.getShipList(id_)
-                    cache[id_] = set_
+                shipIDs = cache.get(id_)
+                if shipIDs is None:
+                    shipIDs = tuple(ship.ID for ship in sMkt.getShipList(id_))
+                    cache[id_] = shipIDs
 
-                wx.CallAfter(callback, (id_, set_))
+                wx.CallAfter(self.deliverShips, callback, id_, shipIDs)
             except Exception as e:
                 pyfalog.critical("Callback failed.")
                 pyfalog.critical(e)
@@ -84,17 +109,25 @@ class ShipBrowserWorkerThread(threading.Thread):
                     pyfalog.critical("Queue task done failed.")
                     pyfalog.critical(e)
 
+    @staticmethod
+    def deliverShips(callback, id_, shipIDs):
+        """Load ships in GUI thread, so that they belong to its gamedata session"""
+        ships = set(eos.db.getItems(shipIDs, eager=("group", "marketGroup")))
+        callback((id_, ships))
+
 
 class PriceWorkerThread(threading.Thread):
     def __init__(self):
         threading.Thread.__init__(self)
         self.name = "PriceWorker"
         pyfalog.debug("Initialize PriceWorkerThread.")
+        self.queue = Queue.Queue()
+        self.wait = {}
+        # Worker starts with first price request, so price file is in place before anything is fetched
+        Price.setLocalFile(Fit.getInstance().serviceFittingOptions["priceFile"])
 
     def run(self):
         pyfalog.debug("Run start")
-        self.queue = Queue.Queue()
-        self.wait = {}
         self.processUpdates()
         pyfalog.debug("Run end")
 
@@ -132,12 +165,16 @@ class SearchWorkerThread(threading.Thread):
         threading.Thread.__init__(self)
         self.name = "SearchWorker"
         pyfalog.debug("Initialize SearchWorkerThread.")
-
-    def run(self):
         self.cv = threading.Condition()
         self.searchRequest = None
+
+    def run(self):
         self.processSearches()
 
+    def isCancelled(self):
+        """Current search is not needed anymore if newer one has been scheduled"""
+        return self.searchRequest is not None
+
     def processSearches(self):
         cv = self.cv
 
@@ -151,23 +188,28 @@ class SearchWorkerThread(threading.Thread):
             cv.release()
             sMkt = Market.getInstance()
             if filterOn is True:
-                # Rely on category data provided by eos as we don't hardcode them much in service
-                filter_ = or_(types_Category.name.in_(sMkt.SEARCH_CATEGORIES), types_Group.name.in_(sMkt.SEARCH_GROUPS))
+                categories, groups = sMkt.SEARCH_CATEGORIES, sMkt.SEARCH_GROUPS
             elif filterOn:  # filter by selected categories
-                filter_ = types_Category.name.in_(filterOn)
+                categories, groups = filterOn, None
             else:
-                filter_ = None
+                categories, groups = None, None
 
-            results = eos.db.searchItems(request, where=filter_,
-                                         join=(types_Item.group, types_Group.category),
-                                         eager=("icon", "group.category", "metaGroup", "metaGroup.parent"))
+            # Index contains published items only, it's built on first search
+            itemIDs = sMkt.getSearchIndex().search(request, categories=categories, groups=groups,
+                                                   isCancelled=self.isCancelled)
+            if itemIDs is None:
+                continue
 
-            items = set()
-            # Return only published items, consult with Market service this time
-            for item in results:
-                if sMkt.getPublicityByItem(item):
-                    items.add(item)
-            wx.CallAfter(callback, items)
+            if self.isCancelled():
+                continue
+            wx.CallAfter(self.deliverResults, callback, itemIDs)
+
+    def deliverResults(self, callback, itemIDs):
+        """Load found items in GUI thread, so that they belong to its gamedata session"""
+        if self.isCancelled():
+            return
+        items = set(eos.db.getItems(itemIDs, eager=("icon", "group.category", "metaGroup", "metaGroup.parent")))
+        callback(items)
 
     def scheduleSearch(self, text, callback, filterOn=True):
         self.cv.acquire()
@@ -180,7 +222,11 @@ class Market(object):
     instance = None
 
     def __init__(self):
-        self.priceCache = {}
+        timer = Timer("Market init", pyfalog)
+        self.priceCache = QueryCache("prices", maxSize=PRICE_CACHE_SIZE)
+        # Memoized market metadata of items: {typeID: [publicity, group, meta group, market group, parent]}.
+        # Records reference gamedata objects, thus every thread keeps its own table
+        self.__itemInfoLocal = threading.local()
 
         # Init recently used module storage
         serviceMarketRecentlyUsedModules = {"pyfaMarketRecentlyUsedModules": []}
@@ -188,20 +234,20 @@ class Market(object):
         self.serviceMarketRecentlyUsedModules = SettingsProvider.getInstance().getSettings(
                 "pyfaMarketRecentlyUsedModules", serviceMarketRecentlyUsedModules)
 
-        # Start price fetcher
-        self.priceWorkerThread = PriceWorkerThread()
-        self.priceWorkerThread.daemon = True
-        self.priceWorkerThread.start()
-
-        # Thread which handles search
-        self.searchWorkerThread = SearchWorkerThread()
-        self.searchWorkerThread.daemon = True
-        self.searchWorkerThread.start()
-
-        # Ship browser helper thread
-        self.shipBrowserWorkerThread = ShipBrowserWorkerThread()
-        self.shipBrowserWorkerThread.daemon = True
-        self.shipBrowserWorkerThread.start()
+        # Materialized market tree: {market group ID: (typeID, ...)}. Contents depend on gamedata
+        # and on overrides defined in this service, so drop it when any of them may have changed
+        marketTreeKey = (eos.config.gamedata_version, config.version, config.debug)
+        self.marketTree = SettingsProvider.getInstance().getSettings(
+                "pyfaMarketTree", {"key": marketTreeKey, "groups": {}, "complete": False})
+        if self.marketTree["key"] != marketTreeKey:
+            self.marketTree["key"] = marketTreeKey
+            self.marketTree["groups"] = {}
+            self.marketTree["complete"] = False
+        timer.checkpoint("settings")
+
+        # Price fetcher, search and ship browser helper threads are started on first use
+        self.__workers = {}
+        self.__workersLock = threading.Lock()
 
         # Items' group overrides
         self.customGroups = set()
@@ -254,8 +300,10 @@ class Market(object):
         }
 
         self.ITEMS_FORCEGROUP_R = self.__makeRevDict(self.ITEMS_FORCEGROUP)
-        self.les_grp.addItems = list(self.getItem(itmn) for itmn in self.ITEMS_FORCEGROUP_R[self.les_grp])
+        # Items of custom groups, resolved on first use: {group ID: (typeID, ...)}
+        self.forcedGroupItems = {}
         self.customGroups.add(self.les_grp)
+        timer.checkpoint("custom groups")
 
         # List of items which are forcibly published or hidden
         self.ITEMS_FORCEPUBLISHED = {
@@ -293,6 +341,7 @@ class Market(object):
             group = self.getGroup("Ship Modifiers", eager="items")
             for item in group.items:
                 self.ITEMS_FORCEPUBLISHED[item.name] = True
+            timer.checkpoint("debug publicity overrides")
 
         # List of groups which are forcibly published
         self.GROUPS_FORCEPUBLISHED = {
@@ -398,6 +447,14 @@ class Market(object):
             "Structure Module",
         )
         self.SEARCH_GROUPS = ("Ice Product",)
+        # Implant and booster grade families, built on first use
+        self.implantFamilies = None
+        # In-memory item name index used by market and ship searches
+        self.searchIndex = ItemSearchIndex()
+        # Name to typeID map for lookups by name, conversions included
+        self.nameIndex = ItemNameIndex()
+        # Static ship / module fitting compatibility data
+        self.compatibilityIndex = ShipCompatibilityIndex()
         self.ROOT_MARKET_GROUPS = (9,  # Modules
                                    1111,  # Rigs
                                    157,  # Drones
@@ -408,6 +465,7 @@ class Market(object):
                                    2202,  # Structure Equipment
                                    2203  # Structure Modifications
                                    )
+        timer.checkpoint("static tables")
         # Tell other threads that Market is at their service
         mktRdy.set()
 
@@ -417,6 +475,59 @@ class Market(object):
             cls.instance = Market()
         return cls.instance
 
+    def __getWorker(self, name, threadClass):
+        """Get helper thread, starting it if it's not running yet"""
+        worker = self.__workers.get(name)
+        if worker is None:
+            with self.__workersLock:
+                worker = self.__workers.get(name)
+                if worker is None:
+                    worker = threadClass()
+                    worker.daemon = True
+                    worker.start()
+                    self.__workers[name] = worker
+        return worker
+
+    @property
+    def priceWorkerThread(self):
+        return self.__getWorker("price", PriceWorkerThread)
+
+    @property
+    def searchWorkerThread(self):
+        return self.__getWorker("search", SearchWorkerThread)
+
+    @property
+    def shipBrowserWorkerThread(self):
+        return self.__getWorker("shipBrowser", ShipBrowserWorkerThread)
+
+    def warmUp(self):
+        """Fill lazily built tables ahead of their first use"""
+        with Timer("Market warm-up", pyfalog) as timer:
+            self.getSearchIndex()
+            timer.checkpoint("search index")
+            self.getNameIndex()
+            timer.checkpoint("name index")
+            self.getImplantFamilyIndex()
+            timer.checkpoint("implant families")
+            self.getCompatibilityIndex()
+            timer.checkpoint("compatibility index")
+            if not self.marketTree["complete"]:
+                self.buildMarketTree()
+                timer.checkpoint("market tree")
+
+    def startWarmUp(self):
+        """Run warm-up in background, so it doesn't hold up the GUI"""
+        def run():
+            try:
+                self.warmUp()
+            except Exception as e:
+                pyfalog.error("Market warm-up failed.")
+                pyfalog.error(e)
+
+        thread = threading.Thread(target=run, name="MarketWarmUp")
+        thread.daemon = True
+        thread.start()
+
     @staticmethod
     def __makeRevDict(orig):
         """Creates reverse dictionary"""
@@ -437,9 +548,12 @@ class Market(object):
                 item = eos.db.getItem(identity, *args, **kwargs)
             elif isinstance(identity, basestring):
                 # We normally lookup with string when we are using import/export
-                # features. Check against overrides
-                identity = conversions.all.get(identity, identity)
-                item = eos.db.getItem(identity, *args, **kwargs)
+                # features. Names are case-insensitive and converted names are
+                # taken into account, no database lookup by name is needed
+                typeID = Market.getInstance().getNameIndex().getTypeID(identity)
+                if typeID is None:
+                    raise ValueError("No item with such name")
+                item = eos.db.getItem(typeID, *args, **kwargs)
 
             elif isinstance(identity, float):
                 id_ = int(identity)
@@ -510,12 +624,30 @@ class Market(object):
             raise TypeError("Need MarketGroup object, integer or float as argument")
         return marketGroup
 
+    def __getItemInfo(self, item):
+        """
+        Get record with memoized market metadata of item. Fields are filled on
+        first request, and the whole table is dropped if gamedata changes
+        """
+        local = self.__itemInfoLocal
+        if getattr(local, "version", None) != eos.config.gamedata_version:
+            local.itemInfo = {}
+            local.version = eos.config.gamedata_version
+        info = local.itemInfo.get(item.ID)
+        if info is None:
+            info = local.itemInfo[item.ID] = [ITEMINFO_MISSING] * ITEMINFO_SIZE
+        return info
+
     def getGroupByItem(self, item):
         """Get group by item"""
-        if item.name in self.ITEMS_FORCEGROUP:
-            group = self.ITEMS_FORCEGROUP[item.name]
-        else:
-            group = item.group
+        info = self.__getItemInfo(item)
+        group = info[ITEMINFO_GROUP]
+        if group is ITEMINFO_MISSING:
+            if item.name in self.ITEMS_FORCEGROUP:
+                group = self.ITEMS_FORCEGROUP[item.name]
+            else:
+                group = item.group
+            info[ITEMINFO_GROUP] = group
         return group
 
     def getCategoryByItem(self, item):
@@ -526,6 +658,10 @@ class Market(object):
 
     def getMetaGroupByItem(self, item):
         """Get meta group by item"""
+        info = self.__getItemInfo(item)
+        metaGroup = info[ITEMINFO_METAGROUP]
+        if metaGroup is not ITEMINFO_MISSING:
+            return metaGroup
         # Check if item is in forced metagroup map
         if item.name in self.ITEMS_FORCEDMETAGROUP:
             # Create meta group from scratch
@@ -545,6 +681,7 @@ class Market(object):
         # meta group if any
         else:
             metaGroup = item.metaGroup
+        info[ITEMINFO_METAGROUP] = metaGroup
         return metaGroup
 
     def getMetaGroupIdByItem(self, item, fallback=0):
@@ -554,75 +691,77 @@ class Market(object):
 
     def getMarketGroupByItem(self, item, parentcheck=True):
         """Get market group by item, its ID or name"""
-        # Check if we force market group for given item
-        if item.name in self.ITEMS_FORCEDMARKETGROUP:
-            mgid = self.ITEMS_FORCEDMARKETGROUP[item.name]
-            return self.getMarketGroup(mgid)
-        # Check if item itself has market group
-        elif item.marketGroupID:
-            return item.marketGroup
-        elif parentcheck:
+        info = self.__getItemInfo(item)
+        marketGroup = info[ITEMINFO_MARKETGROUP]
+        if marketGroup is ITEMINFO_MISSING:
+            # Check if we force market group for given item
+            if item.name in self.ITEMS_FORCEDMARKETGROUP:
+                mgid = self.ITEMS_FORCEDMARKETGROUP[item.name]
+                marketGroup = self.getMarketGroup(mgid)
+            # Check if item itself has market group
+            elif item.marketGroupID:
+                marketGroup = item.marketGroup
+            else:
+                marketGroup = None
+            info[ITEMINFO_MARKETGROUP] = marketGroup
+        if marketGroup is None and parentcheck:
             # If item doesn't have marketgroup, check if it has parent
             # item and use its market group
             parent = self.getParentItemByItem(item, selfparent=False)
             if parent:
                 return parent.marketGroup
-            else:
-                return None
-        else:
-            return None
+        return marketGroup
 
     def getParentItemByItem(self, item, selfparent=True):
         """Get parent item by item"""
-        mg = self.getMetaGroupByItem(item)
-        if mg:
-            parent = mg.parent
+        info = self.__getItemInfo(item)
+        parent = info[ITEMINFO_PARENT]
+        if parent is ITEMINFO_MISSING:
+            mg = self.getMetaGroupByItem(item)
+            parent = info[ITEMINFO_PARENT] = mg.parent if mg else None
         # Consider self as parent if item has no parent in database
-        elif selfparent is True:
+        if parent is None and selfparent is True:
             parent = item
-        else:
-            parent = None
         return parent
 
+    def getImplantFamilyIndex(self):
+        """
+        Get {typeID: family key} and {family key: set(typeIDs)} maps for implants
+        and boosters which come in grades (Low-Grade Snake Alpha, Synth Blue Pill
+        Booster, Zainou 'Gnome' Shield Upgrades SU-601...). Family key is group ID
+        plus name with grade markers stripped.
+        """
+        if self.implantFamilies is None or self.implantFamilies[0] != eos.config.gamedata_version:
+            keys = {}
+            families = {}
+            for typeID, name, _, groupID, _, categoryID, _ in eos.db.getItemSearchData():
+                # Implants and Boosters
+                if categoryID != 20 or name is None:
+                    continue
+                baseName = IMPLANT_GRADE_MARKERS.sub("", name)
+                if baseName == name:
+                    continue
+                key = (groupID, u" ".join(baseName.split()))
+                keys[typeID] = key
+                families.setdefault(key, set()).add(typeID)
+            self.implantFamilies = (eos.config.gamedata_version, keys, families)
+        return self.implantFamilies[1], self.implantFamilies[2]
+
     def getVariationsByItems(self, items, alreadyparent=False):
         """Get item variations by item, its ID or name"""
         # Set for IDs of parent items
         parents = set()
         # Set-container for variables
         variations = set()
-        variations_limiter = set()
+        # IDs of graded implants and boosters from the same families as passed items
+        familyIDs = set()
         for item in items:
             if item.category.ID == 20:  # Implants and Boosters
-                implant_remove_list = set()
-                implant_remove_list.add("Low-Grade ")
-                implant_remove_list.add("Low-grade ")
-                implant_remove_list.add("Mid-Grade ")
-                implant_remove_list.add("Mid-grade ")
-                implant_remove_list.add("High-Grade ")
-                implant_remove_list.add("High-grade ")
-                implant_remove_list.add("Limited ")
-                implant_remove_list.add(" - Advanced")
-                implant_remove_list.add(" - Basic")
-                implant_remove_list.add(" - Elite")
-                implant_remove_list.add(" - Improved")
-                implant_remove_list.add(" - Standard")
-                implant_remove_list.add("Copper ")
-                implant_remove_list.add("Gold ")
-                implant_remove_list.add("Silver ")
-                implant_remove_list.add("Advanced ")
-                implant_remove_list.add("Improved ")
-                implant_remove_list.add("Prototype ")
-                implant_remove_list.add("Standard ")
-                implant_remove_list.add("Strong ")
-                implant_remove_list.add("Synth ")
-
-                for implant_prefix in ("-6", "-7", "-8", "-9", "-10"):
-                    for i in range(50):
-                        implant_remove_list.add(implant_prefix + str("%02d" % i))
-
-                for text_to_remove in implant_remove_list:
-                    if text_to_remove in item.name:
-                        variations_limiter.add(item.name.replace(text_to_remove, ""))
+                familyKeys, families = self.getImplantFamilyIndex()
+                key = familyKeys.get(item.ID)
+                if key is not None:
+                    familyIDs.update(families[key])
+                    continue
 
             # Get parent item
             if alreadyparent is False:
@@ -637,19 +776,16 @@ class Market(object):
                     i = self.getItem(_item)
                     if i:
                         variations.add(i)
+        if familyIDs:
+            variations.update(eos.db.getItems(familyIDs))
+        if not parents:
+            return variations
         # Add all parents to variations set
         variations.update(parents)
         # Add all variations of parents to the set
         parentids = tuple(item.ID for item in parents)
         groupids = tuple(item.group.ID for item in parents)
         variations_list = eos.db.getVariations(parentids, groupids)
-
-        if variations_limiter:
-            for limit in variations_limiter:
-                trimmed_variations_list = [variation_item for variation_item in variations_list if limit in variation_item.name]
-            if trimmed_variations_list:
-                variations_list = trimmed_variations_list
-
         variations.update(variations_list)
         return variations
 
@@ -672,14 +808,54 @@ class Market(object):
         # Return only public items; also, filter out items
         # which were forcibly set to other groups
         groupItems = set(group.items)
-        if hasattr(group, 'addItems'):
-            groupItems.update(group.addItems)
+        if group in self.customGroups:
+            groupItems.update(self.getForcedGroupItems(group))
         items = set(
                 filter(lambda item: self.getPublicityByItem(item) and self.getGroupByItem(item) == group, groupItems))
         return items
 
+    def getForcedGroupItems(self, group):
+        """Get items which are forcibly assigned to custom group"""
+        typeIDs = self.forcedGroupItems.get(group.ID)
+        if typeIDs is None:
+            names = self.ITEMS_FORCEGROUP_R.get(group, ())
+            typeIDs = tuple(item.ID for item in filter(None, (self.getItem(name) for name in names)))
+            self.forcedGroupItems[group.ID] = typeIDs
+        return eos.db.getItems(typeIDs)
+
     def getItemsByMarketGroup(self, mg, vars_=True):
         """Get items in the given market group"""
+        if vars_:
+            # Final item lists of market groups are materialized per gamedata
+            # version and kept on disk, as resolving them takes lots of queries
+            typeIDs = self.marketTree["groups"].get(mg.ID)
+            if typeIDs is not None:
+                return set(eos.db.getItems(typeIDs, eager=("icon", "group.category", "metaGroup", "metaGroup.parent")))
+            result = self.__getItemsByMarketGroup(mg, vars_)
+            self.marketTree["groups"][mg.ID] = tuple(item.ID for item in result)
+            return result
+        return self.__getItemsByMarketGroup(mg, vars_)
+
+    def buildMarketTree(self):
+        """
+        Materialize item lists of all market groups reachable from market root,
+        and save them right away instead of waiting for clean exit
+        """
+        with Timer("Build market tree", pyfalog):
+            pending = list(self.ROOT_MARKET_GROUPS)
+            while pending:
+                mg = self.getMarketGroup(pending.pop(), eager=("children", "items"))
+                if mg is None:
+                    continue
+                if self.marketGroupHasTypesCheck(mg):
+                    self.getItemsByMarketGroup(mg)
+                pending.extend(child.ID for child in mg.children)
+            self.marketTree["complete"] = True
+        # Settings are pickled in GUI thread, where the tree is read and extended too
+        wx.CallAfter(self.marketTree.save)
+
+    def __getItemsByMarketGroup(self, mg, vars_=True):
+        """Resolve items of the given market group from gamedata"""
         result = set()
         # Get items from eos market group
         baseitms = set(mg.items)
@@ -757,10 +933,14 @@ class Market(object):
 
     def getPublicityByItem(self, item):
         """Return if an item is published"""
-        if item.name in self.ITEMS_FORCEPUBLISHED:
-            pub = self.ITEMS_FORCEPUBLISHED[item.name]
-        else:
-            pub = item.published
+        info = self.__getItemInfo(item)
+        pub = info[ITEMINFO_PUBLICITY]
+        if pub is ITEMINFO_MISSING:
+            if item.name in self.ITEMS_FORCEPUBLISHED:
+                pub = self.ITEMS_FORCEPUBLISHED[item.name]
+            else:
+                pub = item.published
+            info[ITEMINFO_PUBLICITY] = pub
         return pub
 
     def getPublicityByGroup(self, group):
@@ -801,16 +981,29 @@ class Market(object):
         """Background version of getShipList"""
         self.shipBrowserWorkerThread.queue.put((id_, callback))
 
+    def getSearchIndex(self):
+        """Get item name search index, building it for current gamedata if needed"""
+        if not self.searchIndex.built:
+            self.searchIndex.build(self.ITEMS_FORCEPUBLISHED)
+        return self.searchIndex
+
+    def getNameIndex(self):
+        """Get item name index, building it for current gamedata if needed"""
+        if not self.nameIndex.built:
+            self.nameIndex.build()
+        return self.nameIndex
+
+    def getCompatibilityIndex(self):
+        """Get ship / module compatibility index, building it for current gamedata if needed"""
+        if not self.compatibilityIndex.built:
+            self.compatibilityIndex.build()
+        return self.compatibilityIndex
+
     def searchShips(self, name):
         """Find ships according to given text pattern"""
-        filter_ = types_Category.name.in_(["Ship", "Structure"])
-        results = eos.db.searchItems(name, where=filter_,
-                                     join=(types_Item.group, types_Group.category),
-                                     eager=("icon", "group.category", "metaGroup", "metaGroup.parent"))
-        ships = set()
-        for item in results:
-            if self.getPublicityByItem(item):
-                ships.add(item)
+        # Index contains published items only
+        shipIDs = self.getSearchIndex().search(name, categories=("Ship", "Structure"))
+        ships = set(eos.db.getItems(shipIDs, eager=("icon", "group.category", "metaGroup", "metaGroup.parent")))
         return ships
 
     def searchItems(self, name, callback, filterOn=True):
@@ -819,6 +1012,8 @@ class Market(object):
 
     @staticmethod
     def getItemsWithOverrides():
+        # Make sure items get their overrides even if they're disabled at the moment
+        eos.db.loadOverrides()
         overrides = eos.db.getAllOverrides()
         items = set()
         for x in overrides:
@@ -835,10 +1030,11 @@ class Market(object):
             itemIDs = tuple(map(lambda i: i.ID, items))
         except TypeError:
             itemIDs = (items.ID,)
-        try:
-            attrIDs = tuple(map(lambda i: i.ID, attribs))
-        except TypeError:
+        # Single attribute may be AttributeMeta, which is a tuple itself
+        if hasattr(attribs, "ID"):
             attrIDs = (attribs.ID,)
+        else:
+            attrIDs = tuple(map(lambda i: i.ID, attribs))
         info = {}
         for itemID, typeID, val in eos.db.directAttributeRequest(itemIDs, attrIDs):
             info[itemID] = val
@@ -857,27 +1053,43 @@ class Market(object):
 
     def getPriceNow(self, typeID):
         """Get price for provided typeID"""
-        price = self.priceCache.get(typeID)
-        if price is None:
-            price = eos.db.getPrice(typeID)
-            if price is None:
-                price = types_Price(typeID)
-                eos.db.add(price)
-
-            self.priceCache[typeID] = price
-
-        return price
+        return self.getPricesNow((typeID,))[0]
 
     def getPricesNow(self, typeIDs):
-        """Return map of calls to get price against list of typeIDs"""
-        return map(self.getPrice, typeIDs)
+        """
+        Get price objects for list of typeIDs, in the same order. Prices which
+        are not in memory are loaded from database in bulk, and prices which
+        were never fetched are created.
+        """
+        prices = []
+        missing = set()
+        for typeID in typeIDs:
+            price = self.priceCache.get(typeID)
+            prices.append(price)
+            if price is QueryCache.MISSING:
+                missing.add(typeID)
+
+        if missing:
+            stored = eos.db.getPrices(missing)
+            created = []
+            for typeID in missing:
+                if typeID not in stored:
+                    stored[typeID] = types_Price(typeID)
+                    created.append(stored[typeID])
+            # New prices are written out right away: if cache drops one of them before
+            # it's committed, database lookup has to find it instead of creating a duplicate
+            if created:
+                eos.db.addAll(created)
+            for typeID in missing:
+                self.priceCache.set(typeID, stored[typeID])
+            prices = [stored[typeID] if price is QueryCache.MISSING else price
+                      for typeID, price in zip(typeIDs, prices)]
+
+        return prices
 
     def getPrices(self, typeIDs, callback):
         """Get prices for multiple typeIDs"""
-        requests = []
-        for typeID in typeIDs:
-            price = self.getPriceNow(typeID)
-            requests.append(price)
+        requests = self.getPricesNow(typeIDs)
 
         def cb():
             try:
@@ -906,7 +1118,7 @@ class Market(object):
         self.priceWorkerThread.setToWait(item.ID, cb)
 
     def clearPriceCache(self):
-        self.priceCache.clear()
+        self.priceCache.invalidate()
         eos.db.clearPrices()
 
     def getSystemWideEffects(self):
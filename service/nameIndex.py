@@ -0,0 +1,85 @@
+# =============================================================================
+# Copyright (C) 2010 Diego Duclos
+#
+# This file is part of pyfa.
+#
+# pyfa is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyfa is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyfa.  If not, see <http://www.gnu.org/licenses/>.
+# =============================================================================
+
+import threading
+
+from logbook import Logger
+
+import eos.config
+import eos.db
+from service import conversions
+from utils.timer import Timer
+
+pyfalog = Logger(__name__)
+
+
+class ItemNameIndex(object):
+    """
+    Case-insensitive map of names of all items to their typeIDs, used when
+    items are looked up by name (fit import, clipboard paste). Old names from
+    service.conversions resolve to the item they were renamed to.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.__lock = threading.Lock()
+        # Lowercase name: typeID
+        self.__names = {}
+
+    @property
+    def built(self):
+        return self.version is not None and self.version == eos.config.gamedata_version
+
+    def build(self):
+        """Load names of all items for current gamedata"""
+        with self.__lock:
+            if self.built:
+                return
+            with Timer("Build item name index", pyfalog):
+                names = {}
+                # If names differ only by case, published items win, then lower typeIDs
+                rows = sorted(eos.db.getItemSearchData(), key=lambda row: (not row[2], row[0]))
+                for typeID, name, _, _, _, _, _ in rows:
+                    if name is not None:
+                        names.setdefault(name.lower(), typeID)
+
+                # Conversions have priority over current names, as they had in Market.getItem
+                converted = {}
+                for oldName, newName in conversions.all.iteritems():
+                    # Items can be renamed more than once, follow renames to current name
+                    seen = set()
+                    while newName not in seen and newName.lower() not in names and newName in conversions.all:
+                        seen.add(newName)
+                        newName = conversions.all[newName]
+                    typeID = names.get(newName.lower())
+                    if typeID is None:
+                        pyfalog.debug("Conversion target {0} of {1} not found", newName, oldName)
+                        continue
+                    converted[oldName.lower()] = typeID
+                names.update(converted)
+
+                self.__names = names
+                self.version = eos.config.gamedata_version
+            pyfalog.debug("Item name index: {0} names, {1} of them converted", len(names), len(converted))
+
+    def getTypeID(self, name):
+        """Get typeID of item with given current or former name, None if there's no such item"""
+        if not self.built:
+            self.build()
+        return self.__names.get(name.lower())
@@ -18,9 +18,13 @@
 # =============================================================================
 
 
-import urllib2
-import urllib
+import io
 import socket
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 from logbook import Logger
 
 import config
@@ -32,6 +36,16 @@ pyfalog = Logger(__name__)
 timeout = 3
 socket.setdefaulttimeout(timeout)
 
+# Requests which are running at the same time, also size of connection pool
+MAX_CONNECTIONS = 4
+# Retries of failed connections and server errors, delays between them grow
+# exponentially from RETRY_BACKOFF seconds
+RETRIES = 2
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (500, 502, 503, 504)
+# Connect and read timeouts of single request, in seconds
+REQUEST_TIMEOUT = (timeout, 30)
+
 
 class Error(StandardError):
     def __init__(self, msg=None):
@@ -54,6 +68,64 @@ class TimeoutError(StandardError):
     pass
 
 
+class HttpClient(object):
+    """
+    Pool of keep-alive connections shared by all requests. Responses are
+    decompressed transparently, connection failures and server errors are
+    retried with backoff, and at most maxConnections requests run at once.
+    """
+
+    def __init__(self, userAgent, maxConnections=MAX_CONNECTIONS, retries=RETRIES, backoff=RETRY_BACKOFF,
+                 timeout=REQUEST_TIMEOUT):
+        self.timeout = timeout
+        self.__slots = threading.BoundedSemaphore(maxConnections)
+        session = requests.Session()
+        # Proxies are passed explicitly according to network settings
+        session.trust_env = False
+        session.headers.update({"User-Agent": userAgent, "Accept-Encoding": "gzip, deflate"})
+        # Requests are not retried once server received them, except on
+        # statuses which tell that it didn't process them
+        retry = Retry(total=retries, read=0, backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                      method_whitelist=False, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=maxConnections, pool_maxsize=maxConnections, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.session = session
+
+    def close(self):
+        self.session.close()
+
+    def request(self, url, data=None, proxies=None, timeout=None):
+        """
+        GET url, or POST data to it if there is any. Returns file-like object
+        with response body, raises one of errors of this module on failure.
+        """
+        method = "POST" if data else "GET"
+        try:
+            with self.__slots:
+                response = self.session.request(method, url, data=data or None, proxies=proxies,
+                                                timeout=timeout or self.timeout)
+                body = response.content
+        except requests.Timeout as error:
+            pyfalog.warning("Request to {0} timed out: {1}", url, error)
+            raise TimeoutError()
+        except requests.RequestException as error:
+            pyfalog.warning("Request to {0} failed: {1}", url, error)
+            raise Error(error)
+
+        if response.status_code >= 400:
+            pyfalog.warning("HTTP error {0} on request to {1}", response.status_code, url)
+            if response.status_code == 404:
+                raise RequestError()
+            elif response.status_code == 403:
+                raise AuthenticationError()
+            elif response.status_code >= 500:
+                raise ServerError()
+            raise Error("HTTP error {0}".format(response.status_code))
+
+        return io.BytesIO(body)
+
+
 class Network(object):
     # Request constants - every request must supply this, as it is checked if
     # enabled or not via settings
@@ -71,7 +143,36 @@ class Network(object):
 
         return cls._instance
 
-    def request(self, url, type, data=None):
+    def __init__(self):
+        self.__client = None
+        self.__clientLock = threading.Lock()
+
+    def getClient(self):
+        """Get HTTP client shared by all requests, its connections are kept open between them"""
+        with self.__clientLock:
+            if self.__client is None:
+                versionString = "{0} {1} - {2} {3}".format(config.version, config.tag, config.expansionName,
+                                                           config.expansionVersion)
+                self.__client = HttpClient("pyfa {0} (Python-requests)".format(versionString))
+            return self.__client
+
+    @staticmethod
+    def getProxies():
+        """Get proxies for requests according to network settings"""
+        proxy = NetworkSettings.getInstance().getProxySettings()
+        if proxy is None:
+            return {}
+        # proxy is a tuple of (host, port):  (u'192.168.20.1', 3128)
+        proxy_auth = NetworkSettings.getInstance().getProxyAuthDetails()
+        # proxy_auth is a tuple of (login, password) or None
+        if proxy_auth is not None:
+            # add login:password@ in front of proxy address
+            address = "http://{0}:{1}@{2}:{3}".format(proxy_auth[0], proxy_auth[1], proxy[0], proxy[1])
+        else:
+            address = "http://{0}:{1}".format(proxy[0], proxy[1])
+        return {"https": address, "http": address}
+
+    def request(self, url, type, data=None, timeout=None):
         # URL is required to be https as of right now
         # print "Starting request: %s\n\tType: %s\n\tPost Data: %s"%(url,type,data)
 
@@ -82,53 +183,4 @@ class Network(object):
             pyfalog.warning("Access not enabled - please enable in Preferences > Network")
             raise Error("Access not enabled - please enable in Preferences > Network")
 
-        # Set up some things for the request
-        versionString = "{0} {1} - {2} {3}".format(config.version, config.tag, config.expansionName,
-                                                   config.expansionVersion)
-        headers = {"User-Agent": "pyfa {0} (Python-urllib2)".format(versionString)}
-
-        proxy = NetworkSettings.getInstance().getProxySettings()
-        if proxy is not None:
-            # proxy is a tuple of (host, port):  (u'192.168.20.1', 3128)
-            proxy_auth = NetworkSettings.getInstance().getProxyAuthDetails()
-            # proxy_auth is a tuple of (login, password) or None
-            if proxy_auth is not None:
-                # add login:password@ in front of proxy address
-                proxy_handler = urllib2.ProxyHandler({
-                    'https': '{0}:{1}@{2}:{3}'.format(
-                            proxy_auth[0], proxy_auth[1], proxy[0], proxy[1])
-                })
-            else:
-                # build proxy handler with no login/pass info
-                proxy_handler = urllib2.ProxyHandler({'https': "{0}:{1}".format(proxy[0], proxy[1])})
-            opener = urllib2.build_opener(proxy_handler)
-            urllib2.install_opener(opener)
-        else:
-            # This is a bug fix, explicitly disable possibly previously installed
-            # opener with proxy, by urllib2.install_opener() a few lines above in code.
-            # Now this explicitly disables proxy handler, "uninstalling" opener.
-            # This is used in case when user had proxy enabled, so proxy_handler was already
-            # installed globally, and then user had disabled the proxy, so we should clear that opener
-            urllib2.install_opener(None)
-            # another option could be installing a default opener:
-            # urllib2.install_opener(urllib2.build_opener())
-
-        request = urllib2.Request(url, headers=headers, data=urllib.urlencode(data) if data else None)
-        try:
-            return urllib2.urlopen(request)
-        except urllib2.HTTPError as error:
-            pyfalog.warning("HTTPError:")
-            pyfalog.warning(error)
-            if error.code == 404:
-                raise RequestError()
-            elif error.code == 403:
-                raise AuthenticationError()
-            elif error.code >= 500:
-                raise ServerError()
-        except urllib2.URLError as error:
-            pyfalog.warning("Timed out or other URL error:")
-            pyfalog.warning(error)
-            if "timed out" in error.reason:
-                raise TimeoutError()
-            else:
-                raise Error(error)
+        return self.getClient().request(url, data, self.getProxies(), timeout)
@@ -19,16 +19,19 @@
 
 import re
 import os
-import xml.dom
+import io
 from logbook import Logger
 import collections
 import json
 import threading
 import locale
+import Queue
 
 from codecs import open
 
 import xml.parsers.expat
+from xml.etree import cElementTree as ElementTree
+from xml.sax.saxutils import escape
 
 from eos import db
 from service.fit import Fit as svcFit
@@ -70,6 +73,27 @@ INV_FLAG_CARGOBAY = 5
 INV_FLAG_DRONEBAY = 87
 INV_FLAG_FIGHTER = 158
 
+# Threads which read and parse files during multi-file import
+IMPORT_WORKERS = 4
+# Fits saved per transaction during multi-file import
+IMPORT_BATCH_SIZE = 200
+
+# First line of EFT fit, [Ship, Fit name]
+EFT_HEADER = re.compile(r"^\s*\[.*,.*\]\s*$")
+# DNA string: ship ID and ID;amount pairs separated with colons, ends with ::
+DNA_STRING = re.compile(r"\d+(?::\d+(?:;\d+)?)*:+:")
+
+
+def _xmlEscape(value):
+    # Same escaping minidom uses for attribute values
+    return escape(unicode(value), {'"': "&quot;"})
+
+
+def _xmlElement(tag, attrs, depth=2):
+    """Serialize empty element, attributes are sorted like minidom does"""
+    attrText = u"".join(u' %s="%s"' % (name, _xmlEscape(attrs[name])) for name in sorted(attrs))
+    return u"%s<%s%s/>\n" % (u"\t" * depth, tag, attrText)
+
 
 class Port(object):
     instance = None
@@ -96,104 +120,254 @@ class Port(object):
     @staticmethod
     def importFitFromFiles(paths, callback=None):
         """
-        Imports fits from file(s). First processes all provided paths and stores
-        assembled fits into a list. This allows us to call back to the GUI as
-        fits are processed as well as when fits are being saved.
-        returns
+        Imports fits from file(s). Files are read and parsed by a pool of
+        IMPORT_WORKERS threads, assembled fits are then saved to database in
+        transactions of IMPORT_BATCH_SIZE fits. This allows us to call back to
+        the GUI as fits are processed as well as when fits are being saved.
+        A broken file doesn't stop import of the others.
+        returns (fits, [(path, error message), ...])
         """
-        defcodepage = locale.getpreferredencoding()
-        sFit = svcFit.getInstance()
+        pathQueue = Queue.Queue()
+        for index, path in enumerate(paths):
+            pathQueue.put((index, path))
+
+        # (fits, error) per path, in order of paths
+        results = [None] * len(paths)
+        workers = [FitFileParseThread(pathQueue, results, callback) for _ in xrange(min(IMPORT_WORKERS, len(paths)))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        fitFiles = []
+        errors = []
+        for path, (fits, error) in zip(paths, results):
+            if error is not None:
+                errors.append((path, error))
+            # DNA importer returns None for strings it can't make a fit of
+            fitFiles.extend((path, fit) for fit in fits if fit is not None)
+
+        fits, saveErrors = Port.saveImportedFits(fitFiles, callback)
+        return fits, errors + saveErrors
 
-        fits = []
-        for path in paths:
-            if callback:  # Pulse
-                pyfalog.debug("Processing file:\n{0}", path)
-                wx.CallAfter(callback, 1, "Processing file:\n%s" % path)
+    @staticmethod
+    def importFitFromFile(path, callback=None):
+        """
+        Read, decode and parse single file.
+        returns (fits, error message or None)
+        """
+        if callback:  # Pulse
+            pyfalog.debug("Processing file:\n{0}", path)
+            wx.CallAfter(callback, 1, "Processing file:\n%s" % path)
+
+        try:
+            srcString, codec_found = Port.readFitFile(path)
+        except IOError as e:
+            pyfalog.warning("Could not read file {0}: {1}", path, e)
+            return [], "Could not read file: %s" % e.strerror
+
+        if srcString is None:  # ignore blank files
+            pyfalog.debug("File is blank.")
+            return [], None
+
+        if codec_found is None:
+            return [], "Proper codec could not be established"
+
+        try:
+            _, fitsImport = Port.importAuto(srcString, path, callback=callback, encoding=codec_found)
+        except (xml.parsers.expat.ExpatError, ElementTree.ParseError):
+            pyfalog.warning("Malformed XML in:\n{0}", path)
+            return [], "Malformed XML"
+        except Exception as e:
+            pyfalog.critical("Unknown exception processing: {0}", path)
+            pyfalog.critical(e)
+            return [], "Unknown Error while processing"
+
+        return list(fitsImport), None
+
+    @staticmethod
+    def readFitFile(path):
+        """
+        Read file and decode it to unicode.
+        returns (string, codec), string is None for blank file and codec is None
+        if it could not be established
+        """
+        defcodepage = locale.getpreferredencoding()
 
-            file_ = open(path, "r")
+        with open(path, "r") as file_:
             srcString = file_.read()
 
-            if len(srcString) == 0:  # ignore blank files
-                pyfalog.debug("File is blank.")
-                continue
+        if len(srcString) == 0:
+            return None, None
 
-            codec_found = None
-            # If file had ANSI encoding, decode it to unicode using detection
-            # of BOM header or if there is no header try default
-            # codepage then fallback to utf-16, cp1252
+        codec_found = None
+        # If file had ANSI encoding, decode it to unicode using detection
+        # of BOM header or if there is no header try default
+        # codepage then fallback to utf-16, cp1252
 
-            if isinstance(srcString, str):
-                savebom = None
+        if isinstance(srcString, str):
+            savebom = None
 
-                encoding_map = (
-                    ('\xef\xbb\xbf', 'utf-8'),
-                    ('\xff\xfe\0\0', 'utf-32'),
-                    ('\0\0\xfe\xff', 'UTF-32BE'),
-                    ('\xff\xfe', 'utf-16'),
-                    ('\xfe\xff', 'UTF-16BE'))
+            encoding_map = (
+                ('\xef\xbb\xbf', 'utf-8'),
+                ('\xff\xfe\0\0', 'utf-32'),
+                ('\0\0\xfe\xff', 'UTF-32BE'),
+                ('\xff\xfe', 'utf-16'),
+                ('\xfe\xff', 'UTF-16BE'))
 
-                for bom, encoding in encoding_map:
-                    if srcString.startswith(bom):
-                        codec_found = encoding
-                        savebom = bom
+            for bom, encoding in encoding_map:
+                if srcString.startswith(bom):
+                    codec_found = encoding
+                    savebom = bom
 
-                if codec_found is None:
-                    pyfalog.info("Unicode BOM not found in file {0}.", path)
-                    attempt_codecs = (defcodepage, "utf-8", "utf-16", "cp1252")
+            if codec_found is None:
+                pyfalog.info("Unicode BOM not found in file {0}.", path)
+                attempt_codecs = (defcodepage, "utf-8", "utf-16", "cp1252")
 
-                    for page in attempt_codecs:
-                        try:
-                            pyfalog.info("Attempting to decode file {0} using {1} page.", path, page)
-                            srcString = unicode(srcString, page)
-                            codec_found = page
-                            pyfalog.info("File {0} decoded using {1} page.", path, page)
-                        except UnicodeDecodeError:
-                            pyfalog.info("Error unicode decoding {0} from page {1}, trying next codec", path, page)
-                        else:
-                            break
-                else:
-                    pyfalog.info("Unicode BOM detected in {0}, using {1} page.", path, codec_found)
-                    srcString = unicode(srcString[len(savebom):], codec_found)
+                for page in attempt_codecs:
+                    try:
+                        pyfalog.info("Attempting to decode file {0} using {1} page.", path, page)
+                        srcString = unicode(srcString, page)
+                        codec_found = page
+                        pyfalog.info("File {0} decoded using {1} page.", path, page)
+                    except UnicodeDecodeError:
+                        pyfalog.info("Error unicode decoding {0} from page {1}, trying next codec", path, page)
+                    else:
+                        break
+            else:
+                pyfalog.info("Unicode BOM detected in {0}, using {1} page.", path, codec_found)
+                srcString = unicode(srcString[len(savebom):], codec_found)
 
+        else:
+            # nasty hack to detect other transparent utf-16 loading
+            if srcString[0] == '<' and 'utf-16' in srcString[:128].lower():
+                codec_found = "utf-16"
             else:
-                # nasty hack to detect other transparent utf-16 loading
-                if srcString[0] == '<' and 'utf-16' in srcString[:128].lower():
-                    codec_found = "utf-16"
-                else:
-                    codec_found = "utf-8"
+                codec_found = "utf-8"
 
-            if codec_found is None:
-                return False, "Proper codec could not be established for %s" % path
+        return srcString, codec_found
+
+    @staticmethod
+    def saveImportedFits(fitFiles, callback=None):
+        """
+        Save fits in batches, each batch is single transaction. If batch fails,
+        its fits are saved one by one to find out which file they came from.
+        Saved fits are detached from session, as they reference gamedata of
+        the thread which parsed them.
+        fitFiles is list of (path, fit), path can be any label of fit source
+        returns (fits, [(path, error message), ...])
+        """
+        sFit = svcFit.getInstance()
+        fits = []
+        errors = []
+        numFits = len(fitFiles)
+        for start in xrange(0, numFits, IMPORT_BATCH_SIZE):
+            batch = fitFiles[start:start + IMPORT_BATCH_SIZE]
+            for _, fit in batch:
+                # Set some more fit attributes and save
+                fit.character = sFit.character
+                fit.damagePattern = sFit.pattern
+                fit.targetResists = sFit.targetResists
 
             try:
-                _, fitsImport = Port.importAuto(srcString, path, callback=callback, encoding=codec_found)
-                fits += fitsImport
-            except xml.parsers.expat.ExpatError:
-                pyfalog.warning("Malformed XML in:\n{0}", path)
-                return False, "Malformed XML in %s" % path
+                db.saveAll([fit for _, fit in batch])
+                saved = batch
             except Exception as e:
-                pyfalog.critical("Unknown exception processing: {0}", path)
-                pyfalog.critical(e)
-                return False, "Unknown Error while processing {0}" % path
+                pyfalog.warning("Failed to save batch of imported fits, saving them one by one: {0}", e)
+                db.rollback()
+                saved = []
+                for path, fit in batch:
+                    try:
+                        db.save(fit)
+                    except Exception as e:
+                        pyfalog.error("Failed to save fit imported from {0}: {1}", path, e)
+                        db.rollback()
+                        errors.append((path, "Could not save fit %s" % fit.name))
+                    else:
+                        saved.append((path, fit))
+
+            savedFits = [fit for _, fit in saved]
+            db.detach(savedFits)
+            fits.extend(savedFits)
 
-        IDs = []
-        numFits = len(fits)
-        for i, fit in enumerate(fits):
-            # Set some more fit attributes and save
-            fit.character = sFit.character
-            fit.damagePattern = sFit.pattern
-            fit.targetResists = sFit.targetResists
-            db.save(fit)
-            IDs.append(fit.ID)
             if callback:  # Pulse
-                pyfalog.debug("Processing complete, saving fits to database: {0}/{1}", i + 1, numFits)
+                pyfalog.debug("Processing complete, saving fits to database: {0}/{1}", start + len(batch), numFits)
                 wx.CallAfter(
                     callback, 1,
                     "Processing complete, saving fits to database\n(%d/%d)" %
-                    (i + 1, numFits)
+                    (start + len(batch), numFits)
                 )
 
-        return True, fits
+        return fits, errors
+
+    @staticmethod
+    def importFitsFromBufferThreaded(bufferStr, activeFit=None, callback=None):
+        pyfalog.debug("Starting import fits from buffer thread.")
+        thread = FitBufferImportThread(bufferStr, activeFit, callback)
+        thread.start()
+
+    @staticmethod
+    def splitBuffer(string):
+        """
+        Split text which can hold many fits, like EFT blocks and DNA strings
+        pasted from chat or forums, into pieces for importAuto. Text outside
+        of them is dropped. XML and JSON documents, as well as text where no
+        fits could be told apart, are returned as single piece.
+        """
+        text = string.strip()
+        if not text:
+            return []
+        if text[0] in "<{":
+            return [text]
+
+        pieces = []
+        eftLines = None
+        for line in text.splitlines():
+            if EFT_HEADER.match(line):
+                eftLines = [line]
+                pieces.append(eftLines)
+                continue
+            dnaStrings = DNA_STRING.findall(line)
+            if dnaStrings:
+                eftLines = None
+                pieces.extend(dnaStrings)
+            elif eftLines is not None:
+                eftLines.append(line)
+
+        if not pieces:
+            return [text]
+        return ["\n".join(piece) if isinstance(piece, list) else piece for piece in pieces]
+
+    @staticmethod
+    def importFitsFromBuffer(bufferStr, activeFit=None, callback=None):
+        """
+        Import every fit of buffer, each piece is detected and parsed on its
+        own. Fits are saved in one go and are left uncalculated until opened.
+        returns (fits, [(piece, error message), ...])
+        """
+        pieceFits = []
+        errors = []
+        for piece in Port.splitBuffer(bufferStr):
+            try:
+                _, fits = Port.importAuto(piece, activeFit=activeFit, callback=callback)
+            except Exception as e:
+                pyfalog.warning("Failed to import part of buffer:\n{0}", piece)
+                pyfalog.warning(e)
+                errors.append((piece, "Could not be imported"))
+                continue
+            pieceFits.extend((piece, fit) for fit in fits if fit is not None)
+
+        fits, saveErrors = Port.saveImportedFits(pieceFits, callback)
+        return fits, errors + saveErrors
+
+    @staticmethod
+    def recalcSubsystemSlots(fit):
+        """
+        T3 ships get their slots from subsystems, which are known only after
+        fit is calculated. Other fits are left to be calculated once opened.
+        """
+        if any(module.slot == Slot.SUBSYSTEM for module in fit.modules):
+            svcFit.getInstance().recalc(fit)
 
     @staticmethod
     def importFitFromBuffer(bufferStr, activeFit=None):
@@ -356,7 +530,7 @@ class Port(object):
         moduleList = []
         for module in items:
             try:
-                item = sMkt.getItem(module['type']['id'], eager="group.category")
+                item = sMkt.getItem(module['type']['id'])
                 if module['flag'] == INV_FLAG_DRONEBAY:
                     d = Drone(item)
                     d.amount = module['quantity']
@@ -390,7 +564,7 @@ class Port(object):
                 continue
 
         # Recalc to get slot numbers correct for T3 cruisers
-        svcFit.getInstance().recalc(f)
+        Port.recalcSubsystemSlots(f)
 
         for module in moduleList:
             if module.fits(f):
@@ -440,7 +614,7 @@ class Port(object):
         for itemInfo in info[1:]:
             if itemInfo:
                 itemID, amount = itemInfo.split(";")
-                item = sMkt.getItem(int(itemID), eager="group.category")
+                item = sMkt.getItem(int(itemID))
 
                 if item.category.name == "Drone":
                     d = Drone(item)
@@ -473,7 +647,7 @@ class Port(object):
                             moduleList.append(m)
 
         # Recalc to get slot numbers correct for T3 cruisers
-        svcFit.getInstance().recalc(f)
+        Port.recalcSubsystemSlots(f)
 
         for module in moduleList:
             if module.fits(f):
@@ -547,7 +721,7 @@ class Port(object):
 
             try:
                 # get item information. If we are on a Drone/Cargo line, throw out cargo
-                item = sMkt.getItem(modName, eager="group.category")
+                item = sMkt.getItem(modName)
             except:
                 # if no data can be found (old names)
                 pyfalog.warning("no data can be found (old names)")
@@ -612,7 +786,7 @@ class Port(object):
                     moduleList.append(m)
 
         # Recalc to get slot numbers correct for T3 cruisers
-        svcFit.getInstance().recalc(fit)
+        Port.recalcSubsystemSlots(fit)
 
         for m in moduleList:
             if m.fits(fit):
@@ -701,7 +875,7 @@ class Port(object):
                             droneAmount = int(droneData.group(2)) if droneData else 1
                             # Bail if we can't get item or it's not from drone category
                             try:
-                                droneItem = sMkt.getItem(droneName, eager="group.category")
+                                droneItem = sMkt.getItem(droneName)
                             except:
                                 pyfalog.warning("Cannot get item.")
                                 continue
@@ -723,7 +897,7 @@ class Port(object):
                         elif entityType == "Implant":
                             # Bail if we can't get item or it's not from implant category
                             try:
-                                implantItem = sMkt.getItem(entityData, eager="group.category")
+                                implantItem = sMkt.getItem(entityData)
                             except:
                                 pyfalog.warning("Cannot get item.")
                                 continue
@@ -739,7 +913,7 @@ class Port(object):
                         elif entityType == "Booster":
                             # Bail if we can't get item or it's not from implant category
                             try:
-                                boosterItem = sMkt.getItem(entityData, eager="group.category")
+                                boosterItem = sMkt.getItem(entityData)
                             except:
                                 pyfalog.warning("Cannot get item.")
                                 continue
@@ -794,7 +968,7 @@ class Port(object):
                             # Add charge to mod if applicable, on any errors just don't add anything
                             if chargeName:
                                 try:
-                                    chargeItem = sMkt.getItem(chargeName, eager="group.category")
+                                    chargeItem = sMkt.getItem(chargeName)
                                     if chargeItem.category.name == "Charge":
                                         m.charge = chargeItem
                                 except:
@@ -804,7 +978,7 @@ class Port(object):
                             moduleList.append(m)
 
                 # Recalc to get slot numbers correct for T3 cruisers
-                svcFit.getInstance().recalc(f)
+                Port.recalcSubsystemSlots(f)
 
                 for module in moduleList:
                     if module.fits(f):
@@ -825,89 +999,110 @@ class Port(object):
 
     @staticmethod
     def importXml(text, callback=None, encoding="utf-8"):
+        return list(Port.iterImportXml(io.BytesIO(text.encode(encoding)), callback))
+
+    @staticmethod
+    def iterImportXml(source, callback=None):
+        """
+        Parse EVE XML from file name or file object and yield fits one by one.
+        Every fitting element is dropped once its fit is assembled, so memory
+        use doesn't grow with size of document.
+        """
         sMkt = Market.getInstance()
+        root = None
 
-        doc = xml.dom.minidom.parseString(text.encode(encoding))
-        fittings = doc.getElementsByTagName("fittings").item(0)
-        fittings = fittings.getElementsByTagName("fitting")
-        fits = []
+        for event, elem in ElementTree.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag != "fitting":
+                continue
 
-        for i, fitting in enumerate(fittings):
-            f = Fit()
-            f.name = fitting.getAttribute("name")
-            # <localized hint="Maelstrom">Maelstrom</localized>
-            shipType = fitting.getElementsByTagName("shipType").item(0).getAttribute("value")
-            try:
-                try:
-                    f.ship = Ship(sMkt.getItem(shipType))
-                except ValueError:
-                    f.ship = Citadel(sMkt.getItem(shipType))
-            except Exception as e:
-                pyfalog.warning("Caught exception on importXml")
-                pyfalog.error(e)
+            f = Port._importXmlFitting(elem, sMkt)
+            # Fitting is processed, free it and what was parsed before it
+            elem.clear()
+            root.clear()
+            if f is None:
                 continue
-            hardwares = fitting.getElementsByTagName("hardware")
-            moduleList = []
-            for hardware in hardwares:
-                try:
-                    moduleName = hardware.getAttribute("type")
-                    try:
-                        item = sMkt.getItem(moduleName, eager="group.category")
-                    except Exception as e:
-                        pyfalog.warning("Caught exception on importXml")
-                        pyfalog.error(e)
-                        continue
-                    if item:
-                        if item.category.name == "Drone":
-                            d = Drone(item)
-                            d.amount = int(hardware.getAttribute("qty"))
-                            f.drones.append(d)
-                        elif item.category.name == "Fighter":
-                            ft = Fighter(item)
-                            ft.amount = int(hardware.getAttribute("qty")) if ft.amount <= ft.fighterSquadronMaxSize else ft.fighterSquadronMaxSize
-                            f.fighters.append(ft)
-                        elif hardware.getAttribute("slot").lower() == "cargo":
-                            # although the eve client only support charges in cargo, third-party programs
-                            # may support items or "refits" in cargo. Support these by blindly adding all
-                            # cargo, not just charges
-                            c = Cargo(item)
-                            c.amount = int(hardware.getAttribute("qty"))
-                            f.cargo.append(c)
-                        else:
-                            try:
-                                m = Module(item)
-                            # When item can't be added to any slot (unknown item or just charge), ignore it
-                            except ValueError:
-                                pyfalog.warning("item can't be added to any slot (unknown item or just charge), ignore it")
-                                continue
-                            # Add subsystems before modules to make sure T3 cruisers have subsystems installed
-                            if item.category.name == "Subsystem":
-                                if m.fits(f):
-                                    m.owner = f
-                                    f.modules.append(m)
-                            else:
-                                if m.isValidState(State.ACTIVE):
-                                    m.state = State.ACTIVE
 
-                                moduleList.append(m)
+            yield f
+            if callback:
+                wx.CallAfter(callback, None)
 
-                except KeyboardInterrupt:
-                    pyfalog.warning("Keyboard Interrupt")
+    @staticmethod
+    def _importXmlFitting(fitting, sMkt):
+        f = Fit()
+        f.name = fitting.get("name", "")
+        # <localized hint="Maelstrom">Maelstrom</localized>
+        shipType = fitting.find(".//shipType").get("value", "")
+        try:
+            try:
+                f.ship = Ship(sMkt.getItem(shipType))
+            except ValueError:
+                f.ship = Citadel(sMkt.getItem(shipType))
+        except Exception as e:
+            pyfalog.warning("Caught exception on importXml")
+            pyfalog.error(e)
+            return None
+        hardwares = fitting.iter("hardware")
+        moduleList = []
+        for hardware in hardwares:
+            try:
+                moduleName = hardware.get("type", "")
+                try:
+                    item = sMkt.getItem(moduleName)
+                except Exception as e:
+                    pyfalog.warning("Caught exception on importXml")
+                    pyfalog.error(e)
                     continue
+                if item:
+                    if item.category.name == "Drone":
+                        d = Drone(item)
+                        d.amount = int(hardware.get("qty", ""))
+                        f.drones.append(d)
+                    elif item.category.name == "Fighter":
+                        ft = Fighter(item)
+                        ft.amount = int(hardware.get("qty", "")) if ft.amount <= ft.fighterSquadronMaxSize else ft.fighterSquadronMaxSize
+                        f.fighters.append(ft)
+                    elif hardware.get("slot", "").lower() == "cargo":
+                        # although the eve client only support charges in cargo, third-party programs
+                        # may support items or "refits" in cargo. Support these by blindly adding all
+                        # cargo, not just charges
+                        c = Cargo(item)
+                        c.amount = int(hardware.get("qty", ""))
+                        f.cargo.append(c)
+                    else:
+                        try:
+                            m = Module(item)
+                        # When item can't be added to any slot (unknown item or just charge), ignore it
+                        except ValueError:
+                            pyfalog.warning("item can't be added to any slot (unknown item or just charge), ignore it")
+                            continue
+                        # Add subsystems before modules to make sure T3 cruisers have subsystems installed
+                        if item.category.name == "Subsystem":
+                            if m.fits(f):
+                                m.owner = f
+                                f.modules.append(m)
+                        else:
+                            if m.isValidState(State.ACTIVE):
+                                m.state = State.ACTIVE
+
+                            moduleList.append(m)
 
-            # Recalc to get slot numbers correct for T3 cruisers
-            svcFit.getInstance().recalc(f)
+            except KeyboardInterrupt:
+                pyfalog.warning("Keyboard Interrupt")
+                continue
 
-            for module in moduleList:
-                if module.fits(f):
-                    module.owner = f
-                    f.modules.append(module)
+        # Recalc to get slot numbers correct for T3 cruisers
+        Port.recalcSubsystemSlots(f)
 
-            fits.append(f)
-            if callback:
-                wx.CallAfter(callback, None)
+        for module in moduleList:
+            if module.fits(f):
+                module.owner = f
+                f.modules.append(module)
 
-        return fits
+        return f
 
     @staticmethod
     def _exportEftBase(fit):
@@ -1040,87 +1235,87 @@ class Port(object):
 
     @classmethod
     def exportXml(cls, callback=None, *fits):
-        doc = xml.dom.minidom.Document()
-        fittings = doc.createElement("fittings")
-        doc.appendChild(fittings)
-        sFit = svcFit.getInstance()
+        output = io.StringIO()
+        cls.writeXml(output, fits, callback)
+        return output.getvalue()
+
+    @classmethod
+    def writeXml(cls, stream, fits, callback=None):
+        """
+        Write fits to stream as EVE XML. Each fit is serialized and written on
+        its own, so fits can be a generator which loads them one at a time.
+        """
+        stream.write(u'<?xml version="1.0" ?>\n<fittings>\n')
 
         for i, fit in enumerate(fits):
             try:
-                fitting = doc.createElement("fitting")
-                fitting.setAttribute("name", fit.name)
-                fittings.appendChild(fitting)
-                description = doc.createElement("description")
-                description.setAttribute("value", "")
-                fitting.appendChild(description)
-                shipType = doc.createElement("shipType")
-                shipType.setAttribute("value", fit.ship.item.name)
-                fitting.appendChild(shipType)
-
-                charges = {}
-                slotNum = {}
-                for module in fit.modules:
-                    if module.isEmpty:
-                        continue
-
-                    slot = module.slot
-
-                    if slot == Slot.SUBSYSTEM:
-                        # Order of subsystem matters based on this attr. See GH issue #130
-                        slotId = module.getModifiedItemAttr("subSystemSlot") - 125
-                    else:
-                        if slot not in slotNum:
-                            slotNum[slot] = 0
-
-                        slotId = slotNum[slot]
-                        slotNum[slot] += 1
-
-                    hardware = doc.createElement("hardware")
-                    hardware.setAttribute("type", module.item.name)
-                    slotName = Slot.getName(slot).lower()
-                    slotName = slotName if slotName != "high" else "hi"
-                    hardware.setAttribute("slot", "%s slot %d" % (slotName, slotId))
-                    fitting.appendChild(hardware)
-
-                    if module.charge and sFit.serviceFittingOptions["exportCharges"]:
-                        if module.charge.name not in charges:
-                            charges[module.charge.name] = 0
-                        # `or 1` because some charges (ie scripts) are without qty
-                        charges[module.charge.name] += module.numCharges or 1
-
-                for drone in fit.drones:
-                    hardware = doc.createElement("hardware")
-                    hardware.setAttribute("qty", "%d" % drone.amount)
-                    hardware.setAttribute("slot", "drone bay")
-                    hardware.setAttribute("type", drone.item.name)
-                    fitting.appendChild(hardware)
-
-                for fighter in fit.fighters:
-                    hardware = doc.createElement("hardware")
-                    hardware.setAttribute("qty", "%d" % fighter.amountActive)
-                    hardware.setAttribute("slot", "fighter bay")
-                    hardware.setAttribute("type", fighter.item.name)
-                    fitting.appendChild(hardware)
-
-                for cargo in fit.cargo:
-                    if cargo.item.name not in charges:
-                        charges[cargo.item.name] = 0
-                    charges[cargo.item.name] += cargo.amount
-
-                for name, qty in charges.items():
-                    hardware = doc.createElement("hardware")
-                    hardware.setAttribute("qty", "%d" % qty)
-                    hardware.setAttribute("slot", "cargo")
-                    hardware.setAttribute("type", name)
-                    fitting.appendChild(hardware)
+                stream.write(cls._exportXmlFitting(fit))
             except:
                 print("Failed on fitID: %d" % fit.ID)
-                continue
             finally:
                 if callback:
                     wx.CallAfter(callback, i)
 
-        return doc.toprettyxml()
+        stream.write(u"</fittings>\n")
+
+    @staticmethod
+    def _exportXmlFitting(fit):
+        sFit = svcFit.getInstance()
+        lines = [u'\t<fitting name="%s">\n' % _xmlEscape(fit.name),
+                 _xmlElement("description", {"value": ""}),
+                 _xmlElement("shipType", {"value": fit.ship.item.name})]
+
+        charges = {}
+        slotNum = {}
+        for module in fit.modules:
+            if module.isEmpty:
+                continue
+
+            slot = module.slot
+
+            if slot == Slot.SUBSYSTEM:
+                # Order of subsystem matters based on this attr. See GH issue #130
+                slotId = module.getModifiedItemAttr("subSystemSlot") - 125
+            else:
+                if slot not in slotNum:
+                    slotNum[slot] = 0
+
+                slotId = slotNum[slot]
+                slotNum[slot] += 1
+
+            slotName = Slot.getName(slot).lower()
+            slotName = slotName if slotName != "high" else "hi"
+            lines.append(_xmlElement("hardware", {"type": module.item.name,
+                                                  "slot": "%s slot %d" % (slotName, slotId)}))
+
+            if module.charge and sFit.serviceFittingOptions["exportCharges"]:
+                if module.charge.name not in charges:
+                    charges[module.charge.name] = 0
+                # `or 1` because some charges (ie scripts) are without qty
+                charges[module.charge.name] += module.numCharges or 1
+
+        for drone in fit.drones:
+            lines.append(_xmlElement("hardware", {"qty": "%d" % drone.amount,
+                                                  "slot": "drone bay",
+                                                  "type": drone.item.name}))
+
+        for fighter in fit.fighters:
+            lines.append(_xmlElement("hardware", {"qty": "%d" % fighter.amountActive,
+                                                  "slot": "fighter bay",
+                                                  "type": fighter.item.name}))
+
+        for cargo in fit.cargo:
+            if cargo.item.name not in charges:
+                charges[cargo.item.name] = 0
+            charges[cargo.item.name] += cargo.amount
+
+        for name, qty in charges.items():
+            lines.append(_xmlElement("hardware", {"qty": "%d" % qty,
+                                                  "slot": "cargo",
+                                                  "type": name}))
+
+        lines.append(u"\t</fitting>\n")
+        return u"".join(lines)
 
     @staticmethod
     def exportMultiBuy(fit):
@@ -1179,15 +1374,63 @@ class FitBackupThread(threading.Thread):
         path = self.path
         sFit = svcFit.getInstance()
         sPort = Port.getInstance()
-        backedUpFits = sPort.exportXml(self.callback, *sFit.getAllFits())
-        backupFile = open(path, "w", encoding="utf-8")
-        backupFile.write(backedUpFits)
-        backupFile.close()
+        with open(path, "w", encoding="utf-8") as backupFile:
+            sPort.writeXml(backupFile, sFit.iterAllFits(), self.callback)
 
         # Send done signal to GUI
         wx.CallAfter(self.callback, -1)
 
 
+class FitFileParseThread(threading.Thread):
+    """Takes paths from shared queue and parses them until queue is empty"""
+
+    def __init__(self, pathQueue, results, callback):
+        threading.Thread.__init__(self)
+        self.name = "FitFileParse"
+        self.daemon = True
+        self.pathQueue = pathQueue
+        self.results = results
+        self.callback = callback
+
+    def run(self):
+        while True:
+            try:
+                index, path = self.pathQueue.get_nowait()
+            except Queue.Empty:
+                return
+            self.results[index] = Port.importFitFromFile(path, self.callback)
+
+
+class FitBufferImportThread(threading.Thread):
+    def __init__(self, bufferStr, activeFit, callback):
+        threading.Thread.__init__(self)
+        self.name = "FitBufferImport"
+        self.bufferStr = bufferStr
+        self.activeFit = activeFit
+        self.callback = callback
+
+    def run(self):
+        try:
+            fits, errors = Port.importFitsFromBuffer(self.bufferStr, self.activeFit, self.callback)
+
+            # Pieces are labeled by their first line
+            errorText = "\n".join("%s: %s" % (piece.strip().splitlines()[0][:50], error) for piece, error in errors)
+            for piece, error in errors:
+                pyfalog.error("Error while importing from buffer: {0}\n{1}", error, piece)
+            fitIDs = [fit.ID for fit in fits]
+        except Exception as e:
+            # Whatever happens, GUI has to be told that import is over
+            pyfalog.critical("Unexpected error while importing from buffer")
+            pyfalog.critical(e)
+            wx.CallAfter(self.callback, -2, "Unexpected error while importing: %s" % e)
+            return
+
+        if errors and not fits:  # nothing could be imported
+            wx.CallAfter(self.callback, -2, errorText)
+        else:  # Send done signal to GUI
+            wx.CallAfter(FitImportThread.deliverFits, self.callback, fitIDs, errorText)
+
+
 class FitImportThread(threading.Thread):
     def __init__(self, paths, callback):
         threading.Thread.__init__(self)
@@ -1196,10 +1439,21 @@ class FitImportThread(threading.Thread):
 
     def run(self):
         sPort = Port.getInstance()
-        success, result = sPort.importFitFromFiles(self.paths, self.callback)
+        fits, errors = sPort.importFitFromFiles(self.paths, self.callback)
+
+        errorText = "\n".join("%s: %s" % (os.path.basename(path), error) for path, error in errors)
+        for path, error in errors:
+            pyfalog.error("Error while processing file import of {0}: {1}", path, error)
 
-        if not success:  # there was an error during processing
-            pyfalog.error("Error while processing file import: {0}", result)
-            wx.CallAfter(self.callback, -2, result)
+        if errors and not fits:  # nothing could be imported
+            wx.CallAfter(self.callback, -2, errorText)
         else:  # Send done signal to GUI
-            wx.CallAfter(self.callback, -1, result)
+            wx.CallAfter(self.deliverFits, self.callback, [fit.ID for fit in fits], errorText)
+
+    @staticmethod
+    def deliverFits(callback, fitIDs, errorText):
+        """Load imported fits in GUI thread, so that they use its gamedata session"""
+        fits = [fit for fit in (db.getFit(fitID) for fitID in fitIDs) if fit is not None]
+        callback(-1, fits)
+        if errorText:
+            callback(-3, errorText)
@@ -18,11 +18,13 @@
 # =============================================================================
 
 
+import Queue
+import threading
 import time
-from xml.dom import minidom
+from xml.etree import cElementTree as ElementTree
 
 from eos import db
-from service.network import Network, TimeoutError
+from service.network import Network, TimeoutError, MAX_CONNECTIONS
 from service.fit import Fit
 from logbook import Logger
 
@@ -33,6 +35,17 @@ VALIDITY = 24 * 60 * 60  # Price validity period, 24 hours
 REREQUEST = 4 * 60 * 60  # Re-request delay for failed fetches, 4 hours
 TIMEOUT = 15 * 60  # Network timeout delay for connection issues, 15 minutes
 
+# Items per price request, and how many requests are sent at once
+CHUNK_SIZE = 100
+FETCH_WORKERS = MAX_CONNECTIONS
+# Items per gamedata query when checking which items are on the market
+QUERY_CHUNK_SIZE = 500
+
+
+def chunks(seq, size):
+    for i in xrange(0, len(seq), size):
+        yield seq[i:i + size]
+
 
 class Price(object):
     systemsList = {
@@ -43,6 +56,18 @@ class Price(object):
         "Hek": 30002053
     }
 
+    # Source which is asked for prices before going to network, see PriceFileSource
+    localSource = None
+
+    @classmethod
+    def setLocalSource(cls, source):
+        cls.localSource = source
+
+    @classmethod
+    def setLocalFile(cls, path):
+        """Use price file at path as local source, empty path turns local source off"""
+        cls.setLocalSource(PriceFileSource(path) if path else None)
+
     @classmethod
     def invalidPrices(cls, prices):
         for price in prices:
@@ -50,7 +75,11 @@ class Price(object):
 
     @classmethod
     def fetchPrices(cls, prices):
-        """Fetch all prices passed to this method"""
+        """
+        Fetch all prices passed to this method. Prices known to local source
+        are taken from it, the rest are requested in chunks of CHUNK_SIZE
+        items, FETCH_WORKERS requests at once.
+        """
 
         # Dictionary for our price objects
         priceMap = {}
@@ -62,79 +91,81 @@ class Price(object):
         if len(priceMap) == 0:
             return
 
-        # Set of items which are still to be requested from this service
-        toRequest = set()
+        now = time.time()
+        if cls.localSource is not None:
+            for typeID, value in cls.localSource.getPrices(priceMap.keys()).iteritems():
+                cls.setPrice(priceMap.pop(typeID), value, now + VALIDITY)
 
-        # Compose list of items we're going to request
-        for typeID in priceMap:
-            # Get item object
-            item = db.getItem(typeID)
-            # We're not going to request items only with market group, as eve-central
-            # doesn't provide any data for items not on the market
-            if item is not None and item.marketGroupID:
-                toRequest.add(typeID)
+        # Compose list of items we're going to request. We're not going to
+        # request items only with market group, as eve-central doesn't provide
+        # any data for items not on the market
+        toRequest = []
+        for chunk in chunks(priceMap.keys(), QUERY_CHUNK_SIZE):
+            toRequest.extend(item.ID for item in db.getItems(chunk) if item.marketGroupID)
 
         # Do not waste our time if all items are not on the market
         if len(toRequest) == 0:
             return
 
-        # This will store POST data for eve-central
-        data = []
-
         sFit = Fit.getInstance()
-        # Base request URL
-        baseurl = "https://eve-central.com/api/marketstat"
-        data.append(("usesystem", cls.systemsList[sFit.serviceFittingOptions["priceSystem"]]))  # Use Jita for market
-
-        for typeID in toRequest:  # Add all typeID arguments
-            data.append(("typeid", typeID))
-
-        # Attempt to send request and process it
-        try:
-            network = Network.getInstance()
-            data = network.request(baseurl, network.PRICES, data)
-            xml = minidom.parse(data)
-            types = xml.getElementsByTagName("marketstat").item(0).getElementsByTagName("type")
-            # Cycle through all types we've got from request
-            for type_ in types:
-                # Get data out of each typeID details tree
-                typeID = int(type_.getAttribute("id"))
-                sell = type_.getElementsByTagName("sell").item(0)
-                # If price data wasn't there, set price to zero
-                try:
-                    percprice = float(sell.getElementsByTagName("percentile").item(0).firstChild.data)
-                except (TypeError, ValueError):
-                    pyfalog.warning("Failed to get price for: {0}", type_)
-                    percprice = 0
-
-                # Fill price data
-                priceobj = priceMap[typeID]
-                priceobj.price = percprice
-                priceobj.time = time.time() + VALIDITY
-                priceobj.failed = None
-
-                # delete price from working dict
-                del priceMap[typeID]
-
-        # If getting or processing data returned any errors
-        except TimeoutError:
-            # Timeout error deserves special treatment
-            pyfalog.warning("Price fetch timout")
-            for typeID in priceMap.keys():
-                priceobj = priceMap[typeID]
-                priceobj.time = time.time() + TIMEOUT
-                priceobj.failed = True
-                del priceMap[typeID]
-        except:
-            # all other errors will pass and continue onward to the REREQUEST delay
-            pyfalog.warning("Caught exception in fetchPrices")
-            pass
-
-        # if we get to this point, then we've got an error. Set to REREQUEST delay
-        for typeID in priceMap.keys():
-            priceobj = priceMap[typeID]
-            priceobj.time = time.time() + REREQUEST
-            priceobj.failed = True
+        system = cls.systemsList[sFit.serviceFittingOptions["priceSystem"]]
+
+        chunkQueue = Queue.Queue()
+        for chunk in chunks(toRequest, CHUNK_SIZE):
+            chunkQueue.put(chunk)
+        # {typeID: price} of all fetched items, and {typeID: delay} of failed ones
+        fetched = {}
+        failed = {}
+        workers = [PriceFetchThread(chunkQueue, system, fetched, failed)
+                   for _ in xrange(min(FETCH_WORKERS, chunkQueue.qsize()))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        now = time.time()
+        for typeID, value in fetched.iteritems():
+            price = priceMap.get(typeID)
+            if price is not None:
+                cls.setPrice(price, value, now + VALIDITY)
+
+        # Items which weren't in any response, or whose request failed
+        for typeID in toRequest:
+            price = priceMap.get(typeID)
+            if price is not None and typeID not in fetched:
+                price.time = now + failed.get(typeID, REREQUEST)
+                price.failed = True
+
+    @staticmethod
+    def setPrice(price, value, expiry):
+        price.price = value
+        price.time = expiry
+        price.failed = None
+
+    @classmethod
+    def fetchChunk(cls, system, typeIDs):
+        """Request prices of typeIDs from eve-central, returns {typeID: price}"""
+        data = [("usesystem", system)]
+        data.extend(("typeid", typeID) for typeID in typeIDs)
+        network = Network.getInstance()
+        response = network.request("https://eve-central.com/api/marketstat", network.PRICES, data)
+        return dict(cls.parseMarketStat(response))
+
+    @staticmethod
+    def parseMarketStat(source):
+        """Iterate over (typeID, sell percentile price) pairs of marketstat XML, without building whole tree"""
+        for _, element in ElementTree.iterparse(source):
+            if element.tag != "type":
+                continue
+            typeID = int(element.get("id"))
+            # If price data wasn't there, set price to zero
+            try:
+                value = float(element.find("sell").findtext("percentile"))
+            except (AttributeError, TypeError, ValueError):
+                pyfalog.warning("Failed to get price for: {0}", typeID)
+                value = 0
+            element.clear()
+            yield typeID, value
 
     @classmethod
     def fitItemsList(cls, fit):
@@ -155,3 +186,70 @@ class Price(object):
             typeIDs.append(cargo.itemID)
 
         return typeIDs
+
+
+class PriceFetchThread(threading.Thread):
+    """Takes chunks of typeIDs from shared queue and fetches their prices until queue is empty"""
+
+    def __init__(self, chunkQueue, system, fetched, failed):
+        threading.Thread.__init__(self)
+        self.name = "PriceFetch"
+        self.daemon = True
+        self.chunkQueue = chunkQueue
+        self.system = system
+        self.fetched = fetched
+        self.failed = failed
+
+    def run(self):
+        while True:
+            try:
+                chunk = self.chunkQueue.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                self.fetched.update(Price.fetchChunk(self.system, chunk))
+            except TimeoutError:
+                # Timeout error deserves special treatment
+                pyfalog.warning("Price fetch timeout")
+                self.failed.update((typeID, TIMEOUT) for typeID in chunk)
+            except Exception as e:
+                # all other errors will get REREQUEST delay
+                pyfalog.warning("Caught exception in fetchPrices: {0}", e)
+
+
+class PriceFileSource(object):
+    """
+    Local price source which reads "typeID,price" lines of text file, to price
+    items without network access. File is picked in preferences and set with
+    Price.setLocalFile.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.__prices = None
+        self.__lock = threading.Lock()
+
+    def load(self):
+        prices = {}
+        with open(self.path, "r") as f:
+            for line in f:
+                fields = line.strip().split(",")
+                if len(fields) != 2:
+                    continue
+                try:
+                    prices[int(fields[0])] = float(fields[1])
+                except ValueError:
+                    pyfalog.warning("Skipping malformed line in {0}: {1}", self.path, line.strip())
+        return prices
+
+    def getPrices(self, typeIDs):
+        """Get {typeID: price} for those of typeIDs which are in the file"""
+        with self.__lock:
+            if self.__prices is None:
+                try:
+                    self.__prices = self.load()
+                except IOError as e:
+                    pyfalog.warning("Failed to read prices from {0}: {1}", self.path, e)
+                    self.__prices = {}
+        prices = self.__prices
+        return dict((typeID, prices[typeID]) for typeID in typeIDs if typeID in prices)
@@ -0,0 +1,169 @@
+# =============================================================================
+# Copyright (C) 2010 Diego Duclos
+#
+# This file is part of pyfa.
+#
+# pyfa is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyfa is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyfa.  If not, see <http://www.gnu.org/licenses/>.
+# =============================================================================
+
+import bisect
+import re
+import threading
+
+from logbook import Logger
+
+import eos.config
+import eos.db
+from utils.timer import Timer
+
+pyfalog = Logger(__name__)
+
+
+class ItemSearchIndex(object):
+    """
+    In-memory index over names of published items, used by market and ship
+    searches instead of running LIKE queries over the items table.
+
+    Every word of every name is kept in a sorted list, which allows to find
+    items with words starting with the query token by bisection. Tokens which
+    do not start a word (or contain wildcards) are checked against the full
+    name, which gives the same results as the old SQL search did.
+    """
+
+    # How many names to scan between checks if search request is still wanted
+    CANCEL_CHECK_INTERVAL = 2000
+
+    wordSplitter = re.compile(r"\W+", re.UNICODE)
+
+    def __init__(self):
+        self.version = None
+        self.__lock = threading.Lock()
+        # typeID: lowercase name
+        self.__names = {}
+        # typeID: (category name, group name)
+        self.__classes = {}
+        # Sorted list of (lowercase word, typeID)
+        self.__words = []
+
+    @property
+    def built(self):
+        return self.version is not None and self.version == eos.config.gamedata_version
+
+    def build(self, forcePublished=None):
+        """
+        Build index for current gamedata, forcePublished is {item name: publicity}
+        map which has priority over publicity flag of items
+        """
+        forcePublished = forcePublished or {}
+        with self.__lock:
+            if self.built:
+                return
+            with Timer("Build item search index", pyfalog):
+                names = {}
+                classes = {}
+                words = []
+                for typeID, name, published, _, groupName, _, categoryName in eos.db.getItemSearchData():
+                    if name is None or not forcePublished.get(name, published):
+                        continue
+                    lname = name.lower()
+                    names[typeID] = lname
+                    classes[typeID] = (categoryName, groupName)
+                    for word in set(self.wordSplitter.split(lname)):
+                        if word:
+                            words.append((word, typeID))
+                words.sort()
+                self.__names = names
+                self.__classes = classes
+                self.__words = words
+                self.version = eos.config.gamedata_version
+            pyfalog.debug("Item search index: {0} items, {1} words", len(names), len(words))
+
+    def __wordMatches(self, token):
+        """Return set of typeIDs which have a word starting with token"""
+        words = self.__words
+        ids = set()
+        i = bisect.bisect_left(words, (token,))
+        while i < len(words) and words[i][0].startswith(token):
+            ids.add(words[i][1])
+            i += 1
+        return ids
+
+    def search(self, text, categories=None, groups=None, limit=100, isCancelled=None):
+        """
+        Find items which contain all whitespace-separated tokens of text in their
+        names, "*" can be used as wildcard. If categories or groups are passed,
+        item has to belong to any of them. Returns list of typeIDs, best matches
+        first, or None if search was cancelled.
+        """
+        query = text.lower().strip()
+        tokens = [token for token in query.split(" ") if token]
+        if not tokens:
+            return []
+
+        names = self.__names
+        classes = self.__classes
+
+        matchers = []
+        wordTokens = []
+        for token in tokens:
+            if "*" in token:
+                regex = re.compile(".*".join(re.escape(part) for part in token.split("*")), re.UNICODE)
+                matchers.append(regex.search)
+            else:
+                matchers.append(lambda name, token=token: token in name)
+                if not self.wordSplitter.search(token):
+                    wordTokens.append(token)
+
+        def accepted(typeID):
+            if categories is None and groups is None:
+                return True
+            categoryName, groupName = classes[typeID]
+            return (categories is not None and categoryName in categories) or \
+                (groups is not None and groupName in groups)
+
+        def matchesAll(name):
+            for matcher in matchers:
+                if not matcher(name):
+                    return False
+            return True
+
+        # Items which have words starting with every token rank highest, and
+        # they are found without looking at all the names
+        prefixIDs = set()
+        if len(wordTokens) == len(tokens):
+            prefixIDs = self.__wordMatches(wordTokens[0])
+            for token in wordTokens[1:]:
+                if not prefixIDs:
+                    break
+                prefixIDs &= self.__wordMatches(token)
+        primary = [typeID for typeID in prefixIDs if accepted(typeID)]
+
+        if isCancelled is not None and isCancelled():
+            return None
+
+        secondary = []
+        if len(primary) < limit:
+            for i, (typeID, name) in enumerate(names.iteritems()):
+                if isCancelled is not None and i % self.CANCEL_CHECK_INTERVAL == 0 and isCancelled():
+                    return None
+                if typeID not in prefixIDs and matchesAll(name) and accepted(typeID):
+                    secondary.append(typeID)
+
+        def rank(typeID):
+            name = names[typeID]
+            return name != query, not name.startswith(query), len(name), name
+
+        primary.sort(key=rank)
+        secondary.sort(key=rank)
+        return (primary + secondary)[:limit]
@@ -426,6 +426,7 @@ class ContextMenuSettings(object):
             "openFit"               : 1,
             "priceClear"            : 1,
             "project"               : 1,
+            "shipFitsValue"         : 1,
             "shipJump"              : 1,
             "tacticalMode"          : 1,
             "targetResists"         : 1,
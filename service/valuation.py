@@ -0,0 +1,154 @@
+# =============================================================================
+# Copyright (C) 2010 Diego Duclos
+#
+# This file is part of pyfa.
+#
+# pyfa is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyfa is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyfa.  If not, see <http://www.gnu.org/licenses/>.
+# =============================================================================
+
+from collections import namedtuple
+
+from logbook import Logger
+
+import eos.db
+from service.fit import Fit
+from service.market import Market
+
+pyfalog = Logger(__name__)
+
+# Value of single fit; copies is how many of them are bought, value is ISK
+# value of one copy and missing tells how many of its items have no price
+FitValue = namedtuple("FitValue", ("fitID", "name", "shipName", "copies", "value", "missing"))
+
+
+class FitValuation(object):
+    """Values of multiple fits and combined list of items needed to buy all of them"""
+
+    def __init__(self, fitValues, amounts, prices, names):
+        self.fitValues = fitValues
+        # typeID: amount of all fits together
+        self.amounts = amounts
+        # typeID: ISK price of single item, types without price are left out
+        self.prices = prices
+        # typeID: item name
+        self.names = names
+
+    @property
+    def total(self):
+        return sum(fitValue.value * fitValue.copies for fitValue in self.fitValues)
+
+    def exportMultiBuy(self):
+        """Combined multibuy of all fits, items are sorted by name"""
+        lines = []
+        for typeID in sorted(self.amounts, key=lambda typeID: self.names[typeID]):
+            amount = self.amounts[typeID]
+            lines.append("%s x%s" % (self.names[typeID], amount) if amount > 1 else self.names[typeID])
+        return "\n".join(lines)
+
+    def exportTotals(self):
+        """Per-fit values, one fit per line, followed by grand total"""
+        lines = []
+        for fitValue in self.fitValues:
+            line = "[%s, %s] x%d: %.2f ISK" % (fitValue.shipName, fitValue.name, fitValue.copies,
+                                               fitValue.value * fitValue.copies)
+            if fitValue.missing:
+                line += " (%d items without price)" % fitValue.missing
+            lines.append(line)
+        lines.append("Total: %.2f ISK" % self.total)
+        return "\n".join(lines)
+
+
+class Valuation(object):
+    instance = None
+
+    @classmethod
+    def getInstance(cls):
+        if cls.instance is None:
+            cls.instance = Valuation()
+
+        return cls.instance
+
+    @staticmethod
+    def getFitItems(fit, names=None):
+        """
+        Get {typeID: amount} of everything needed to assemble fit, same items
+        which multibuy export lists. Names of items are stored into names map
+        if it's passed.
+        """
+        items = {}
+
+        def add(item, amount=1):
+            if item is not None and amount > 0:
+                items[item.ID] = items.get(item.ID, 0) + amount
+                if names is not None:
+                    names[item.ID] = item.name
+
+        exportCharges = Fit.getInstance().serviceFittingOptions["exportCharges"]
+        add(fit.ship.item)
+        for module in fit.modules:
+            if module.isEmpty:
+                continue
+            add(module.item)
+            if module.charge and exportCharges:
+                add(module.charge, module.numCharges)
+        for drone in fit.drones:
+            add(drone.item, drone.amount)
+        for cargo in fit.cargo:
+            add(cargo.item, cargo.amount)
+        for implant in fit.implants:
+            add(implant.item)
+        for booster in fit.boosters:
+            add(booster.item)
+        for fighter in fit.fighters:
+            add(fighter.item, fighter.amountActive)
+        return items
+
+    def valueFits(self, fitIDs, callback, copies=None):
+        """
+        Value fits and collect items needed to buy all of them. Fits are read
+        one at a time, all their items are priced with single price lookup.
+        Copies is optional {fitID: amount} map telling how many of each fit
+        are needed. Callback receives FitValuation once prices are fetched.
+        """
+        copies = copies or {}
+        fitItems = []
+        amounts = {}
+        names = {}
+        for fitID in fitIDs:
+            fit = eos.db.getFit(fitID)
+            if fit is None:
+                pyfalog.warning("Fit {0} not found, skipping it in valuation", fitID)
+                continue
+            items = self.getFitItems(fit, names)
+            fitCopies = copies.get(fitID, 1)
+            fitItems.append((fit.ID, fit.name, fit.ship.item.name, fitCopies, items))
+            for typeID, amount in items.iteritems():
+                amounts[typeID] = amounts.get(typeID, 0) + amount * fitCopies
+
+        typeIDs = sorted(amounts)
+
+        def pricesFetched(prices):
+            priceMap = dict((price.typeID, price.price) for price in prices if price.price)
+            fitValues = []
+            for fitID, name, shipName, fitCopies, items in fitItems:
+                value = sum(priceMap.get(typeID, 0) * amount for typeID, amount in items.iteritems())
+                missing = sum(1 for typeID in items if typeID not in priceMap)
+                fitValues.append(FitValue(fitID, name, shipName, fitCopies, value, missing))
+            callback(FitValuation(fitValues, amounts, priceMap, names))
+
+        Market.getInstance().getPrices(typeIDs, pricesFetched)
+
+    def valueShipFits(self, shipID, callback):
+        """Value all fits of given ship type, e.g. all fits of a doctrine hull"""
+        self.valueFits([fitID for fitID, _, _, _ in Fit.getFitsWithShip(shipID)], callback)
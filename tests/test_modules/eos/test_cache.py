@@ -0,0 +1,31 @@
+from eos.db.cache import QueryCache
+
+
+def test_queryCache():
+    cache = QueryCache("test", maxSize=2)
+    cache.set(1, "a")
+    cache.set(2, "b")
+
+    # Touch first entry so second one becomes least recently used
+    assert cache.get(1) == "a"
+    cache.set(3, "c")
+
+    assert 1 in cache
+    assert 2 not in cache
+    assert cache.get(2) is QueryCache.MISSING
+
+    # None results are valid cache entries
+    cache.set(4, None)
+    assert cache.get(4) is None
+
+    stats = cache.stats
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 2
+    assert stats["size"] == 2
+    assert stats["maxSize"] == 2
+
+    cache.invalidate(4)
+    assert len(cache) == 1
+    cache.invalidate()
+    assert len(cache) == 0
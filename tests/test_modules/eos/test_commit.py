@@ -0,0 +1,49 @@
+import eos.db.saveddata.queries as queries
+
+
+class StubSession(object):
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def flush(self):
+        pass
+
+
+def test_requestCommit(monkeypatch):
+    session = StubSession()
+    monkeypatch.setattr(queries, "saveddata_session", session)
+    monkeypatch.setitem(queries.commitState, "pending", False)
+    monkeypatch.setitem(queries.commitState, "scheduler", None)
+
+    # Without scheduler changes are committed right away
+    queries.requestCommit()
+    assert session.commits == 1
+
+    scheduled = []
+    queries.setCommitScheduler(scheduled.append)
+    queries.requestCommit()
+    queries.requestCommit()
+    # Only first request schedules commit, nothing is committed yet
+    assert scheduled == [queries.flushCommits]
+    assert session.commits == 1
+    assert queries.commitState["pending"]
+
+    scheduled[0]()
+    assert session.commits == 2
+    assert not queries.commitState["pending"]
+    # Nothing is pending anymore, flush is a no-op
+    queries.flushCommits()
+    assert session.commits == 2
+
+    # Direct commit takes pending changes with it, and next request schedules again
+    queries.requestCommit()
+    queries.commit()
+    assert session.commits == 3
+    assert not queries.commitState["pending"]
+    queries.flushCommits()
+    assert session.commits == 3
+    queries.requestCommit()
+    assert len(scheduled) == 3
@@ -0,0 +1,27 @@
+import os
+from collections import namedtuple
+
+from service.apiCache import ApiCacheHandler
+
+Meta = namedtuple("Meta", ("currentTime", "cachedUntil"))
+
+
+def test_apiCache(tmpdir):
+    cache = ApiCacheHandler(str(tmpdir), maxSize=100)
+    params = {"keyID": 1, "vCode": "secret"}
+
+    assert cache.retrieve("api.eveonline.com", "/account/Characters.xml.aspx", params) is None
+    cache.store("api.eveonline.com", "/account/Characters.xml.aspx", params, b"<eveapi/>", Meta(1000, 4600))
+    assert cache.retrieve("api.eveonline.com", "/account/Characters.xml.aspx", params) == b"<eveapi/>"
+    # Other parameters make other entry, and secrets are not in file names
+    assert cache.retrieve("api.eveonline.com", "/account/Characters.xml.aspx", {"keyID": 2}) is None
+    assert not any("secret" in name for name in os.listdir(str(tmpdir)))
+
+    # Documents which can't be cached are not stored
+    cache.store("api.eveonline.com", "/char/CharacterSheet.xml.aspx", params, b"<eveapi/>", Meta(1000, 1000))
+    assert cache.retrieve("api.eveonline.com", "/char/CharacterSheet.xml.aspx", params) is None
+
+    # Cache is kept within size limit, documents which expire first go first
+    cache.store("api.eveonline.com", "/char/CharacterSheet.xml.aspx", params, b"x" * 80, Meta(1000, 90000))
+    assert cache.retrieve("api.eveonline.com", "/account/Characters.xml.aspx", params) is None
+    assert cache.retrieve("api.eveonline.com", "/char/CharacterSheet.xml.aspx", params) == b"x" * 80
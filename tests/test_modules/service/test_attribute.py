@@ -40,3 +40,16 @@ def test_attribute():
     assert type(info.unit.unitID) is int
     assert info.unit.unitName == 'Length'
     assert type(info.unit.unitName) is unicode
+
+
+def test_attributeMeta():
+    sAttr = Attribute.getInstance()
+    info = sAttr.getAttributeInfo("maxRange")
+    meta = sAttr.getAttributeMeta("maxRange")
+
+    assert meta is sAttr.getAttributeMeta(54)
+    assert meta.ID == info.attributeID
+    assert meta.displayName == info.displayName
+    assert meta.iconFile == info.icon.iconFile
+    assert meta.unitDisplayName == info.unit.displayName
+    assert sAttr.getAttributeMeta("notAnAttribute") is None
@@ -0,0 +1,97 @@
+import eos.db
+from eos.saveddata.module import State
+from service.fit import Fit
+
+
+class StubFit(object):
+    def __init__(self, fitID, modules):
+        self.ID = fitID
+        self.factorReload = False
+        self.modules = modules
+        self.projectedModules = []
+        self.projectedDrones = []
+        self.inited = True
+        self.calculations = 0
+
+    def clear(self):
+        pass
+
+    def calculateModifiedAttributes(self, withBoosters=False):
+        self.calculations += 1
+
+
+class StubModule(object):
+    def __init__(self, valid):
+        self.state = State.ACTIVE
+        self.valid = valid
+
+    def canHaveState(self, state, fit=None):
+        return self.valid
+
+    def isValidState(self, state):
+        return self.valid
+
+
+def makeService():
+    # Skip __init__, it needs character and damage pattern from database
+    sFit = Fit.__new__(Fit)
+    sFit.dirtyFitIDs = set()
+    sFit.stateChecks = {}
+    sFit.recalcScheduler = None
+    sFit.serviceFittingOptions = {"useGlobalForceReload": False}
+    return sFit
+
+
+def test_requestRecalc(monkeypatch):
+    base = StubModule(False)
+    other = StubModule(False)
+    fit = StubFit(1, [base, other])
+    monkeypatch.setattr(eos.db, "getFit", {1: fit}.get)
+    sFit = makeService()
+
+    # Without scheduler fit is calculated right away
+    sFit.requestRecalc(fit)
+    assert fit.calculations == 1
+
+    scheduled = []
+    sFit.setRecalcScheduler(scheduled.append)
+    sFit.requestRecalc(fit, checkStates=True, base=base)
+    sFit.requestRecalc(fit)
+    # Only first request schedules calculation, nothing is calculated yet
+    assert scheduled == [sFit.flushRecalcs]
+    assert fit.calculations == 1
+    assert other.state == State.ACTIVE
+
+    scheduled[0]()
+    # One calculation for both requests, and one more after module state was fixed
+    assert fit.calculations == 3
+    assert other.state == State.ONLINE
+    assert base.state == State.ACTIVE
+    assert not sFit.dirtyFitIDs and not sFit.stateChecks
+
+    # Nothing is pending anymore, flush is a no-op
+    sFit.flushRecalcs()
+    assert fit.calculations == 3
+
+
+def test_getFitFlushes(monkeypatch):
+    fit = StubFit(1, [])
+    otherFit = StubFit(2, [])
+    monkeypatch.setattr(eos.db, "getFit", {1: fit, 2: otherFit}.get)
+    sFit = makeService()
+    scheduled = []
+    sFit.setRecalcScheduler(scheduled.append)
+
+    sFit.requestRecalc(fit)
+    sFit.requestRecalc(otherFit)
+    assert sFit.dirtyFitIDs == {1, 2}
+
+    # Reading fit calculates pending changes of that fit only
+    assert sFit.getFit(1) is fit
+    assert fit.calculations == 1
+    assert otherFit.calculations == 0
+    assert sFit.dirtyFitIDs == {2}
+
+    scheduled[0]()
+    assert fit.calculations == 1
+    assert otherFit.calculations == 1
@@ -0,0 +1,42 @@
+import eos.db
+from eos.db.cache import QueryCache
+from eos.db.gamedata.queries import AttributeMeta
+from service.market import Market
+
+
+class Item(object):
+    def __init__(self, ID):
+        self.ID = ID
+
+
+def test_directAttrRequest(monkeypatch):
+    requests = []
+
+    def directAttributeRequest(itemIDs, attrIDs):
+        requests.append((itemIDs, attrIDs))
+        return [(itemID, itemID, 5.0) for itemID in itemIDs]
+
+    monkeypatch.setattr(eos.db, "directAttributeRequest", directAttributeRequest)
+    metaLevel = AttributeMeta(633, "metaLevel", "Meta Level", 0.0, None, None, True, True, None, None, None, None,
+                              None)
+
+    # Attribute metadata is passed on its own, not as a sequence of attributes
+    assert Market.directAttrRequest([Item(2046), Item(438)], metaLevel) == {2046: 5.0, 438: 5.0}
+    assert Market.directAttrRequest(Item(2046), [metaLevel]) == {2046: 5.0}
+    assert requests == [((2046, 438), (633,)), ((2046,), (633,))]
+
+
+def test_getPricesNow(monkeypatch):
+    # Prices written into database, new ones only get there when they're flushed
+    stored = {}
+    monkeypatch.setattr(eos.db, "getPrices", lambda typeIDs: dict((typeID, stored[typeID])
+                                                                   for typeID in typeIDs if typeID in stored))
+    monkeypatch.setattr(eos.db, "addAll", lambda prices: stored.update((price.typeID, price) for price in prices))
+    sMkt = Market.__new__(Market)
+    sMkt.priceCache = QueryCache("prices", maxSize=1)
+
+    rifter, merlin = sMkt.getPricesNow([587, 603])
+    assert (rifter.typeID, merlin.typeID) == (587, 603)
+    # Rifter was evicted from cache before anything was committed, it's still the same price
+    assert sMkt.getPriceNow(587) is rifter
+    assert sMkt.getPriceNow(603) is merlin
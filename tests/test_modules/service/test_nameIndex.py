@@ -0,0 +1,26 @@
+from service.nameIndex import ItemNameIndex
+
+
+def test_nameIndex():
+    index = ItemNameIndex()
+    assert not index.built
+
+    rifter = index.getTypeID("Rifter")
+    assert index.built
+    assert rifter == 587
+    assert index.getTypeID("rifter") == rifter
+    assert index.getTypeID("RIFTER") == rifter
+    assert index.getTypeID("No Such Item") is None
+
+
+def test_nameIndex_conversions():
+    index = ItemNameIndex()
+    # Old names resolve to items they were renamed to, regardless of case
+    amplifier = index.getTypeID("Signal Amplifier I")
+    assert amplifier is not None
+    assert index.getTypeID("Ladar Backup Array I") == amplifier
+    assert index.getTypeID("LADAR Backup Array I") == amplifier
+
+    scanner = index.getTypeID("Compact Ship Scanner")
+    assert scanner is not None
+    assert index.getTypeID("Rudimentary Ship Scanner I") == scanner
@@ -0,0 +1,85 @@
+import gzip
+import io
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from service.network import HttpClient, RequestError, ServerError
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self, status, body, gzipped=False):
+        if gzipped:
+            buf = io.BytesIO()
+            with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+                f.write(body)
+            body = buf.getvalue()
+        self.send_response(status)
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.clients.add(self.client_address)
+        if self.path == "/flaky":
+            server.flakyHits += 1
+            if server.flakyHits == 1:
+                self.respond(503, b"busy")
+                return
+        if self.path == "/broken":
+            self.respond(500, b"broken")
+        elif self.path == "/missing":
+            self.respond(404, b"missing")
+        else:
+            self.respond(200, b"path " + self.path.encode("ascii"),
+                         gzipped="gzip" in self.headers.get("Accept-Encoding", ""))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.respond(200, self.rfile.read(length))
+
+
+@pytest.fixture
+def stub():
+    server = HTTPServer(("127.0.0.1", 0), StubHandler)
+    server.clients = set()
+    server.flakyHits = 0
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server, "http://127.0.0.1:{0}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def test_httpClient(stub):
+    server, url = stub
+    client = HttpClient("pyfa test", maxConnections=2, retries=2, backoff=0)
+    try:
+        # Gzipped body is decompressed, and connection is reused
+        for i in range(3):
+            assert client.request(url + "/item/{0}".format(i)).read() == "path /item/{0}".format(i)
+        assert len(server.clients) == 1
+
+        assert client.request(url + "/echo", data=[("typeid", 587), ("typeid", 34)]).read() == \
+            "typeid=587&typeid=34"
+
+        # Server error is retried
+        assert client.request(url + "/flaky").read() == "path /flaky"
+        assert server.flakyHits == 2
+
+        with pytest.raises(ServerError):
+            client.request(url + "/broken")
+        with pytest.raises(RequestError):
+            client.request(url + "/missing")
+    finally:
+        client.close()
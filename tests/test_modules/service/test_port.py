@@ -0,0 +1,39 @@
+from service.port import Port
+
+
+def test_splitBuffer_eft():
+    text = """
+Some chatter before the fits
+
+[Rifter, Tackle]
+Damage Control I
+1MN Afterburner I
+
+[Merlin, Brawler]
+Damage Control I
+"""
+    assert Port.splitBuffer(text) == [
+        "[Rifter, Tackle]\nDamage Control I\n1MN Afterburner I\n",
+        "[Merlin, Brawler]\nDamage Control I",
+    ]
+
+
+def test_splitBuffer_dna():
+    text = "[ 2017.05.01 18:20:11 ] Fleet Boss > take 587:2048;1:438;1:: or 603:2048;1:: please\n" \
+           "no fits on this line\n" \
+           "33468:12058;3::"
+    assert Port.splitBuffer(text) == ["587:2048;1:438;1::", "603:2048;1::", "33468:12058;3::"]
+
+
+def test_splitBuffer_passthrough():
+    xml = '<?xml version="1.0" ?>\n<fittings>\n</fittings>'
+    assert Port.splitBuffer("\n" + xml + "\n") == [xml]
+    json = '{"name": "Tackle", "items": []}'
+    assert Port.splitBuffer(json) == [json]
+    # Text without any recognizable fit goes to importAuto as is
+    assert Port.splitBuffer("  just some text  ") == ["just some text"]
+
+
+def test_splitBuffer_blank():
+    assert Port.splitBuffer("") == []
+    assert Port.splitBuffer(" \n\t\n") == []
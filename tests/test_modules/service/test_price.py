@@ -0,0 +1,63 @@
+import io
+import os
+import time
+
+from service.price import Price, PriceFileSource
+
+MARKETSTAT = b"""<?xml version='1.0' encoding='utf-8'?>
+<evec_api version="2.0" method="marketstat_xml">
+<marketstat>
+<type id="34">
+<buy><volume>1</volume><percentile>5.01</percentile></buy>
+<sell><volume>2</volume><percentile>5.5</percentile></sell>
+</type>
+<type id="587">
+<buy><volume>0</volume><percentile>0</percentile></buy>
+<sell><volume>0</volume></sell>
+</type>
+</marketstat>
+</evec_api>
+"""
+
+
+def test_parseMarketStat():
+    assert dict(Price.parseMarketStat(io.BytesIO(MARKETSTAT))) == {34: 5.5, 587: 0}
+
+
+def test_priceFileSource(tmpdir):
+    path = os.path.join(str(tmpdir), "prices.csv")
+    with open(path, "w") as f:
+        f.write("34,5.5\n587,350000\nbroken line\n")
+
+    source = PriceFileSource(path)
+    assert source.getPrices([34, 587, 35]) == {34: 5.5, 587: 350000.0}
+    assert PriceFileSource(os.path.join(str(tmpdir), "missing.csv")).getPrices([34]) == {}
+
+
+class StubPrice(object):
+    def __init__(self, typeID):
+        self.typeID = typeID
+        self.price = 0
+        self.time = 0
+        self.failed = None
+
+    @property
+    def isValid(self):
+        return self.time >= time.time()
+
+
+def test_localFile(tmpdir, monkeypatch):
+    path = os.path.join(str(tmpdir), "prices.csv")
+    with open(path, "w") as f:
+        f.write("34,5.5\n587,350000\n")
+    monkeypatch.setattr(Price, "localSource", None)
+
+    Price.setLocalFile(path)
+    prices = [StubPrice(34), StubPrice(587)]
+    # Everything is in the file, so nothing goes to network
+    Price.fetchPrices(prices)
+    assert [price.price for price in prices] == [5.5, 350000.0]
+    assert all(price.isValid for price in prices)
+
+    Price.setLocalFile("")
+    assert Price.localSource is None
@@ -0,0 +1,97 @@
+from collections import namedtuple
+
+import eos.db
+from service.fit import Fit
+from service.market import Market
+from service.valuation import Valuation
+
+Item = namedtuple("Item", ("ID", "name"))
+Price = namedtuple("Price", ("typeID", "price"))
+
+
+class Stub(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class StubMarket(object):
+    def __init__(self, prices):
+        self.prices = prices
+        self.requested = None
+
+    def getPrices(self, typeIDs, callback):
+        self.requested = typeIDs
+        callback([Price(typeID, self.prices.get(typeID, 0)) for typeID in typeIDs])
+
+
+rifter = Item(587, "Rifter")
+dc = Item(2046, "Damage Control I")
+ab = Item(438, "1MN Afterburner I")
+emp = Item(185, "EMP S")
+hobgoblin = Item(2454, "Hobgoblin I")
+nanite = Item(28668, "Nanite Repair Paste")
+implant = Item(13283, "Limited Ocular Filter")
+
+
+def makeFit(fitID, name, modules=(), drones=(), cargo=()):
+    return Stub(ID=fitID, name=name, ship=Stub(item=rifter),
+                modules=list(modules), drones=list(drones), cargo=list(cargo),
+                implants=[Stub(item=implant)], boosters=[], fighters=[])
+
+
+def module(item, charge=None, numCharges=0):
+    return Stub(isEmpty=False, item=item, charge=charge, numCharges=numCharges)
+
+
+def test_valueFits(monkeypatch):
+    fits = {
+        1: makeFit(1, "Tackle",
+                   modules=[module(dc), module(ab), Stub(isEmpty=True)],
+                   cargo=[Stub(item=nanite, amount=10)]),
+        2: makeFit(2, "Kite",
+                   modules=[module(ab), module(ab), module(ab, emp, 100)],
+                   drones=[Stub(item=hobgoblin, amount=2)]),
+    }
+    prices = {rifter.ID: 400000, dc.ID: 10000, ab.ID: 5000, emp.ID: 10, hobgoblin.ID: 3000}
+    market = StubMarket(prices)
+    fitService = Stub(serviceFittingOptions={"exportCharges": True})
+    monkeypatch.setattr(Fit, "getInstance", classmethod(lambda cls: fitService))
+    monkeypatch.setattr(Market, "getInstance", classmethod(lambda cls: market))
+    monkeypatch.setattr(eos.db, "getFit", fits.get)
+
+    # Same items of single fit are merged, charges and cargo are counted
+    assert Valuation.getFitItems(fits[2]) == {rifter.ID: 1, ab.ID: 3, emp.ID: 100, hobgoblin.ID: 2, implant.ID: 1}
+    fitService.serviceFittingOptions["exportCharges"] = False
+    assert emp.ID not in Valuation.getFitItems(fits[2])
+    fitService.serviceFittingOptions["exportCharges"] = True
+
+    results = []
+    # Missing fit is skipped
+    Valuation.getInstance().valueFits([1, 2, 3], results.append, copies={2: 3})
+    valuation, = results
+    assert market.requested == sorted(valuation.amounts)
+
+    # Amounts of all fits are merged, taking copies into account
+    assert valuation.amounts == {
+        rifter.ID: 4, dc.ID: 1, ab.ID: 10, emp.ID: 300,
+        hobgoblin.ID: 6, nanite.ID: 10, implant.ID: 4,
+    }
+    assert valuation.exportMultiBuy() == "\n".join((
+        "1MN Afterburner I x10",
+        "Damage Control I",
+        "EMP S x300",
+        "Hobgoblin I x6",
+        "Limited Ocular Filter x4",
+        "Nanite Repair Paste x10",
+        "Rifter x4",
+    ))
+
+    tackle, kite = valuation.fitValues
+    assert (tackle.copies, tackle.value, tackle.missing) == (1, 415000, 2)
+    assert (kite.copies, kite.value, kite.missing) == (3, 422000, 1)
+    assert valuation.total == 415000 + 3 * 422000
+    assert valuation.exportTotals() == "\n".join((
+        "[Rifter, Tackle] x1: 415000.00 ISK (2 items without price)",
+        "[Rifter, Kite] x3: 1266000.00 ISK (1 items without price)",
+        "Total: 1681000.00 ISK",
+    ))